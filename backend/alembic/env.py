@@ -26,6 +26,7 @@ if config.config_file_name is not None:
 # Importar os modelos
 from database import Base
 from models.user import User
+from models.cached_result import CachedResult
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -0,0 +1,38 @@
+"""Create classification_cache table
+
+Revision ID: 3b9d2f71c0a4
+Revises: 788c45fea4d4
+Create Date: 2026-10-17 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f71c0a4'
+down_revision: Union[str, None] = '788c45fea4d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'classification_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('value', sa.JSON(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_access', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_classification_cache_created_at'), 'classification_cache', ['created_at'], unique=False)
+    op.create_index(op.f('ix_classification_cache_last_access'), 'classification_cache', ['last_access'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_classification_cache_last_access'), table_name='classification_cache')
+    op.drop_index(op.f('ix_classification_cache_created_at'), table_name='classification_cache')
+    op.drop_table('classification_cache')
@@ -0,0 +1,26 @@
+"""Add gmail_history_id to users
+
+Revision ID: 5e1c8a9d2b47
+Revises: 3b9d2f71c0a4
+Create Date: 2026-10-17 16:05:12.381944
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1c8a9d2b47'
+down_revision: Union[str, None] = '3b9d2f71c0a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('gmail_history_id', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'gmail_history_id')
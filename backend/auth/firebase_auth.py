@@ -153,9 +153,31 @@ def update_user_gmail_credentials(user: User, credentials: dict, db: Session):
     user.gmail_credentials = credentials
     user.gmail_connected = True
     user.gmail_last_sync = datetime.utcnow()
+    # Nova conexão pode ser outra caixa: a próxima sincronização é completa
+    user.gmail_history_id = None
     db.commit()
     return user
 
+def update_user_gmail_tokens(user_id: int, credentials: dict):
+    """
+    Persistir credenciais do Gmail renovadas (novo access token e expiração)
+    
+    Usa uma sessão própria, pois pode ser chamada fora do ciclo da requisição
+    (ex.: refresh de um serviço reaproveitado do pool). Não altera o estado da
+    sincronização, ao contrário de update_user_gmail_credentials.
+    """
+    db_session = get_db()
+    db = next(db_session)
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None or not user.gmail_connected:
+            return None
+        user.gmail_credentials = credentials
+        db.commit()
+        return user
+    finally:
+        db_session.close()
+
 def disconnect_user_gmail(user: User, db: Session):
     """
     Desconectar Gmail do usuário
@@ -163,5 +185,6 @@ def disconnect_user_gmail(user: User, db: Session):
     user.gmail_credentials = None
     user.gmail_connected = False
     user.gmail_last_sync = None
+    user.gmail_history_id = None
     db.commit()
     return user
@@ -0,0 +1,81 @@
+"""
+Fixtures e benchmark do strip_quoted_reply
+
+Confere o corte de histórico citado e assinatura em casos reais (atribuições
+do Gmail/Outlook/Apple Mail em português e inglês) e em textos comuns que não
+podem ser cortados, e mede o custo em uma conversa longa.
+
+Uso:
+    python backend/benchmarks/bench_reply_stripper.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+# Configurar PYTHONPATH para importar módulos do backend
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from utils.reply_stripper import strip_quoted_reply
+
+# (entrada, saída esperada): histórico e assinatura removidos
+STRIPPED = [
+    (
+        "Segue o comprovante.\n\nEm seg., 1 de jan. de 2024 às 10:00, Maria <maria@x.com> escreveu:\n> Pode enviar?",
+        "Segue o comprovante.",
+    ),
+    (
+        "Segue o comprovante.\n\nEm seg., 1 de jan. de 2024 às 10:00, Maria <\nmaria@x.com> escreveu:\n> Pode enviar?",
+        "Segue o comprovante.",
+    ),
+    (
+        "Sounds good.\n\nOn Mon, Jan 1, 2024 at 10:00 AM Bob <bob@x.com> wrote:\n> Can we meet?",
+        "Sounds good.",
+    ),
+    ("Combinado.\nEm 01/02/2024 10:15, Ana escreveu:\ntexto antigo", "Combinado."),
+    ("Resposta\n-----Mensagem original-----\nDe: A\nEnviado: ontem\ntexto", "Resposta"),
+    ("Resposta\n\nDe: Fulano <f@x.com>\nEnviado: terça-feira\nAssunto: x", "Resposta"),
+    ("Preciso do boleto\n--\nJoão Silva\nGerente", "Preciso do boleto"),
+    ("Preciso do boleto\nEnviado do meu iPhone", "Preciso do boleto"),
+    ("Ok, obrigado\n> linha citada\n> outra", "Ok, obrigado"),
+]
+
+# Textos que devem sair inalterados: parecem atribuição, mas são mensagem nova
+UNCHANGED = [
+    'Bom dia\nEm 2024 tivemos 3 chamados; o cliente escreveu:\n"sistema fora"\nPrecisamos agir',
+    "Em resposta ao chamado, o suporte escreveu:\nreinicie o servidor\nAguardo retorno",
+    "On the last call the client wrote:\nplease escalate\nThanks",
+    "Em anexo a fatura.\nQualquer dúvida estou à disposição.",
+    "> só citação\n> mais",
+]
+
+
+def check_fixtures() -> int:
+    failures = 0
+    for text, expected in STRIPPED + [(text, text) for text in UNCHANGED]:
+        result = strip_quoted_reply(text)
+        if result != expected:
+            failures += 1
+            print(f"FALHA: {text!r}\n  esperado: {expected!r}\n  obtido:   {result!r}")
+    total = len(STRIPPED) + len(UNCHANGED)
+    print(f"Fixtures: {total - failures}/{total} corretas")
+    return failures
+
+
+def main():
+    failures = check_fixtures()
+    body = "Mensagem nova com o pedido de ajuste no contrato.\n" * 5
+    history = "".join(
+        f"\nEm seg., {day} de jan. de 2024 às 10:00, Fulano <f@x.com> escreveu:\n" + "> texto citado\n" * 40
+        for day in range(1, 30)
+    )
+    thread = body + "--\nJoão\n" + history
+    number = 2000
+    elapsed = min(timeit.repeat(lambda: strip_quoted_reply(thread), number=number, repeat=3)) / number
+    print(f"Conversa de {len(thread)} caracteres: {elapsed * 1e6:.1f} µs por email")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark do pipeline especulativo
+
+Mede a taxa de acerto do palpite (EmailClassifier.guess_category) e a
+latência por email do SpeculativePipeline contra o pipeline separado, com
+chamadas ao Gemini simuladas por atrasos fixos. O caso que importa é o email
+produtivo "general" (sem palavras-chave), o único que faz a segunda chamada.
+
+Uso:
+    python backend/benchmarks/bench_speculative_pipeline.py
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Configurar PYTHONPATH para importar módulos do backend
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from models.classifier import EmailClassifier, ClassificationResult
+from models.response_generator import ResponseGenerator
+from models.speculative_pipeline import SpeculativePipeline
+from utils.text_processor import TextProcessor
+
+# Latência simulada de cada chamada ao Gemini (segundos)
+GEMINI_LATENCY = 0.2
+
+# (texto, categoria que o Gemini retornaria)
+EMAILS = [
+    ("Gostaria de agendar uma reunião para discutir a renovação do contrato do próximo ano.", "Produtivo"),
+    ("Podem me enviar a proposta revisada com os novos valores até sexta?", "Produtivo"),
+    ("Preciso alterar o endereço de entrega cadastrado na minha conta.", "Produtivo"),
+    ("Quais documentos são necessários para abrir uma conta empresarial?", "Produtivo"),
+    ("Vocês conseguem antecipar a entrega do relatório trimestral?", "Produtivo"),
+    ("Feliz natal a toda a equipe, boas festas!", "Improdutivo"),
+    ("Obrigado pelo ótimo trabalho de sempre, parabéns a todos.", "Improdutivo"),
+]
+
+
+class SimulatedGemini:
+    """Substitui as chamadas ao Gemini por atrasos fixos, com a categoria esperada"""
+
+    def __init__(self, classifier: EmailClassifier, response_generator: ResponseGenerator, labels: dict):
+        self.calls = 0
+
+        async def apredict(text):
+            self.calls += 1
+            await asyncio.sleep(GEMINI_LATENCY)
+            return ClassificationResult(labels[text], 0.95, "gemini", "Gemini simulado")
+
+        async def reply(text, category):
+            self.calls += 1
+            await asyncio.sleep(GEMINI_LATENCY)
+            return "Resposta gerada"
+
+        classifier.apredict = apredict
+        # Só o caminho produtivo "general" chama o Gemini; os demais seguem com templates
+        response_generator.gemini_client = object()
+        response_generator._agenerate_gemini_response = reply
+
+
+async def run_separate(classifier, response_generator, text):
+    classification = await classifier.apredict(text)
+    return classification, await response_generator.agenerate(classification.category, text)
+
+
+async def measure(label, run, texts):
+    start = time.perf_counter()
+    for text in texts:
+        await run(text)
+    elapsed = (time.perf_counter() - start) / len(texts)
+    print(f"{label:>12} | {elapsed * 1000:9.1f} ms/email")
+
+
+async def main():
+    text_processor = TextProcessor()
+    emails = [(text_processor.process(text), category) for text, category in EMAILS]
+    labels = dict(emails)
+
+    classifier = EmailClassifier()
+    response_generator = ResponseGenerator()
+    SimulatedGemini(classifier, response_generator, labels)
+    pipeline = SpeculativePipeline(classifier, response_generator)
+
+    productive = [text for text, category in emails if category == "Produtivo"]
+    hits = sum(classifier.guess_category(text) == "Produtivo" for text in productive)
+    print(f"Palpites corretos em emails produtivos: {hits}/{len(productive)}")
+
+    await measure("separado", lambda text: run_separate(classifier, response_generator, text), productive)
+    await measure("especulativo", pipeline.arun, productive)
+    await measure("improdutivos", pipeline.arun, [text for text, category in emails if category == "Improdutivo"])
+    print(f"Especulação: {pipeline.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Benchmark do TextProcessor.process
+
+Mede o custo por email em entradas de 1 KB, 10 KB e 1 MB, comparando o
+motor de normalização atual com a cadeia de re.sub original. Também mede
+entradas patológicas (longas sequências de pontuação), que denunciam
+padrões com retentativa quadrática.
+
+Uso:
+    python backend/benchmarks/bench_text_processor.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# Configurar PYTHONPATH para importar módulos do backend
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from utils.text_processor import TextProcessor
+
+SAMPLE = (
+    "Olá equipe, bom dia! Preciso de ajuda com o sistema de pagamento: a fatura 2024/117 "
+    "não foi gerada. Podem verificar o status? Segue o link https://portal.exemplo.com.br/faturas?id=117 "
+    "e meu contato joao.silva@exemplo.com.br ou (11) 98765-4321. Obrigado pelo atendimento!\n\n"
+)
+
+SIZES = {
+    "1 KB": 1024,
+    "10 KB": 10 * 1024,
+    "1 MB": 1024 * 1024,
+}
+
+# Entradas de 1 MB sem espaços que devem continuar lineares
+PATHOLOGICAL = {
+    "'.' * N": lambda size: "." * size,
+    "'-' * N": lambda size: "-" * size,
+    "'a.' * N": lambda size: ("a." * (size // 2 + 1))[:size],
+    "'a@' * N": lambda size: ("a@" * (size // 2 + 1))[:size],
+}
+
+
+def legacy_process(text: str, stop_words: set) -> str:
+    """Implementação original (sete passes de re.sub + filtro de stop words)"""
+    text = text.lower()
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\sáàâãéèêíìîóòôõúùûç]', ' ', text)
+    text = re.sub(r'\b\d+\b', '', text)
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '', text)
+    text = re.sub(r'\(?\d{2}\)?\s?\d{4,5}-?\d{4}', '', text)
+    words = [word for word in text.split() if word not in stop_words and len(word) > 2]
+    return ' '.join(words).strip()
+
+
+def build_input(size: int) -> str:
+    repeats = size // len(SAMPLE) + 1
+    return (SAMPLE * repeats)[:size]
+
+
+def main():
+    processor = TextProcessor()
+    print(f"{'entrada':>8} | {'legado (ms)':>12} | {'atual (ms)':>11} | {'ganho':>6}")
+    for label, size in SIZES.items():
+        text = build_input(size)
+        number = max(1, 2_000_000 // size)
+        legacy = min(timeit.repeat(lambda: legacy_process(text, processor.stop_words), number=number, repeat=3)) / number
+        current = min(timeit.repeat(lambda: processor.process(text), number=number, repeat=3)) / number
+        print(f"{label:>8} | {legacy * 1000:12.3f} | {current * 1000:11.3f} | {legacy / current:5.1f}x")
+
+    size = SIZES["1 MB"]
+    print(f"\n{'patológico (1 MB)':>17} | {'legado (ms)':>12} | {'atual (ms)':>11}")
+    for label, build in PATHOLOGICAL.items():
+        text = build(size)
+        legacy = min(timeit.repeat(lambda: legacy_process(text, processor.stop_words), number=1, repeat=3))
+        current = min(timeit.repeat(lambda: processor.process(text), number=1, repeat=3))
+        print(f"{label:>17} | {legacy * 1000:12.3f} | {current * 1000:11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
 import os
+import time
+import random
 import base64
+import codecs
+import hashlib
+import json
 import logging
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional, Tuple
 
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+try:
+    from utils.html_to_text import html_to_text
+    from utils.reply_stripper import strip_quoted_reply
+except ImportError:
+    from backend.utils.html_to_text import html_to_text
+    from backend.utils.reply_stripper import strip_quoted_reply
+
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +33,79 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.modify",
 ]
 
+# A API aceita até 100 sub-requisições por batch, mas o Gmail recomenda no
+# máximo 50 para evitar erros de limite de taxa
+GMAIL_BATCH_SIZE = min(100, int(os.getenv("GMAIL_BATCH_SIZE", "50")))
+
+# Respostas parciais (parâmetro fields) usadas no preview: só os cabeçalhos
+# necessários (format=metadata) e só os dados das partes (format=full), pedidos
+# no mesmo batch. Anexos chegam no format=full apenas como attachmentId, e o
+# conteúdo só é baixado por get_attachment(). Árvores MIME mais profundas que
+# MIME_FIELDS_DEPTH são buscadas de novo sem máscara
+METADATA_HEADERS = ["Subject", "From", "Message-ID"]
+METADATA_FIELDS = "id,threadId,snippet,payload/headers"
+MIME_FIELDS_DEPTH = int(os.getenv("GMAIL_MIME_FIELDS_DEPTH", "5"))
+
+
+def _parts_fields(depth: int, include_attachments: bool = False) -> str:
+    """Máscara fields recursiva para a árvore MIME (partes aninhadas até depth níveis)"""
+    body = "body(data,attachmentId,size)" if include_attachments else "body/data"
+    fields = f"partId,mimeType,filename,{body}"
+    if depth > 0:
+        fields += f",parts({_parts_fields(depth - 1, include_attachments)})"
+    return fields
+
+
+# Bytes decodificados do corpo de cada email. O classificador usa os primeiros
+# 1000 caracteres do texto processado; a folga cobre o que a limpeza remove
+MAX_BODY_BYTES = int(os.getenv("GMAIL_MAX_BODY_BYTES", "16384"))
+# Corpos só em HTML são lidos em pedaços até html_to_text juntar texto
+# suficiente; este é só o teto para documentos quase sem texto
+MAX_HTML_BYTES = int(os.getenv("GMAIL_MAX_HTML_BYTES", "262144"))
+HTML_DECODE_CHUNK = 8192
+
+# messages.batchModify aceita até 1000 IDs por chamada
+BATCH_MODIFY_MAX_IDS = 1000
+
+# Prefixo dos labels de categoria aplicados após a triagem (ex.: EmailCraft/Produtivo)
+GMAIL_LABEL_PREFIX = os.getenv("GMAIL_LABEL_PREFIX", "EmailCraft")
+
+# Rascunhos criados em lote: novas tentativas para respostas 429/5xx, com
+# backoff exponencial a partir de GMAIL_RETRY_BASE_DELAY segundos
+GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "3"))
+GMAIL_RETRY_BASE_DELAY = float(os.getenv("GMAIL_RETRY_BASE_DELAY", "1.0"))
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Erros transitórios da API (limite de taxa e falhas do servidor)
+
+    Só respostas HttpError 429/5xx: numa falha de transporte do batch inteiro
+    o servidor pode ter executado as sub-requisições, e repeti-las às cegas
+    duplicaria o que foi criado.
+    """
+    if not isinstance(error, HttpError):
+        return False
+    try:
+        status = int(getattr(getattr(error, "resp", None), "status", None))
+    except (TypeError, ValueError):
+        return False
+    return status == 429 or status >= 500
+
+
+# Renovar o access token quando faltar menos que isto para expirar (segundos)
+TOKEN_REFRESH_MARGIN = int(os.getenv("GMAIL_TOKEN_REFRESH_MARGIN", "300"))
+
 
 class GmailService:
     """Wrapper simples para operações essenciais do Gmail no MVP."""
 
-    def __init__(self, credentials_dir: str = None, user_credentials: dict = None):
+    def __init__(self, credentials_dir: str = None, user_credentials: dict = None,
+                 on_credentials_refreshed: Optional[Callable[[dict], None]] = None):
         self.user_credentials = user_credentials  # Credenciais do usuário do banco de dados
+        # Chamado com as credenciais atualizadas após um refresh, para persistir no banco
+        self.on_credentials_refreshed = on_credentials_refreshed
+        self.credentials = None
         
         # Resolve diretório de credenciais de forma independente do CWD
         # 1) Variável de ambiente GMAIL_CREDENTIALS_DIR (opcional)
@@ -43,6 +125,11 @@ class GmailService:
         os.makedirs(self.credentials_dir, exist_ok=True)
         self.token_path = os.path.join(self.credentials_dir, "token.json")
         self.service = None
+        # O transporte HTTP (httplib2) não é thread-safe; o serviço pode ser
+        # compartilhado pelo pool entre requisições
+        self._lock = threading.RLock()
+        # Cache nome -> id dos labels do usuário (preenchido sob demanda)
+        self._label_ids: Optional[Dict[str, str]] = None
         
         # Gmail OAuth credentials from environment variables
         self.client_id = os.getenv("GMAIL_CLIENT_ID")
@@ -98,34 +185,86 @@ class GmailService:
             else:
                 raise ValueError("Nenhuma credencial do usuário fornecida")
 
-            # Verificar se as credenciais são válidas
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    from google.auth.transport.requests import Request
-                    creds.refresh(Request())
-                    logger.info("Credenciais atualizadas com refresh token")
-                else:
+            # Verificar se as credenciais são válidas (renovando antes de expirar)
+            if self._needs_refresh(creds):
+                if creds.refresh_token:
+                    self._refresh(creds)
+                elif not creds.valid:
                     raise ValueError("Credenciais inválidas ou expiradas")
 
+            self.credentials = creds
             self.service = build("gmail", "v1", credentials=creds)
             return True
         except Exception as e:
             logger.error(f"Falha na autenticação Gmail: {e}")
             return False
 
+    @staticmethod
+    def _needs_refresh(creds) -> bool:
+        """Token inválido ou a menos de TOKEN_REFRESH_MARGIN segundos de expirar"""
+        if not creds.valid:
+            return True
+        return creds.expiry is not None and creds.expiry - datetime.utcnow() < timedelta(seconds=TOKEN_REFRESH_MARGIN)
+
+    def _refreshed_credentials(self, creds) -> dict:
+        """Credenciais salvas com o novo token, no mesmo formato em que vieram do banco"""
+        updated = dict(self.user_credentials or {})
+        updated["access_token" if "access_token" in updated else "token"] = creds.token
+        if creds.refresh_token:
+            updated["refresh_token"] = creds.refresh_token
+        updated["expiry"] = creds.expiry.strftime("%Y-%m-%dT%H:%M:%SZ") if creds.expiry else None
+        return updated
+
+    def _refresh(self, creds):
+        """Renova o access token e repassa as credenciais novas para serem persistidas"""
+        from google.auth.transport.requests import Request
+        creds.refresh(Request())
+        logger.info("Credenciais atualizadas com refresh token")
+        self.user_credentials = self._refreshed_credentials(creds)
+        if self.on_credentials_refreshed:
+            try:
+                self.on_credentials_refreshed(self.user_credentials)
+            except Exception as e:
+                logger.error(f"Erro ao persistir credenciais atualizadas: {e}")
+
+    def refresh_if_needed(self) -> bool:
+        """Renova o token de um serviço já autenticado quando está perto de expirar"""
+        # Checagem sem lock primeiro: o lock pode estar com um batch longo deste
+        # mesmo serviço, e na maioria das vezes não há nada a renovar
+        creds = self.credentials
+        if creds is None or not creds.refresh_token or not self._needs_refresh(creds):
+            return False
+        with self._lock:
+            if not self._needs_refresh(self.credentials):
+                return False
+            try:
+                self._refresh(self.credentials)
+                return True
+            except Exception as e:
+                logger.error(f"Falha ao renovar credenciais Gmail: {e}")
+                return False
+
+    def _execute(self, request):
+        """Executa uma requisição da API serializando o uso da conexão HTTP"""
+        with self._lock:
+            return request.execute()
+
+    def _list_unread(self, max_results: int) -> List[Dict]:
+        """Lista as mensagens não lidas, propagando os erros da API"""
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        response = self._execute(
+            self.service.users()
+            .messages()
+            .list(userId="me", q="is:unread", maxResults=max_results)
+        )
+        return response.get("messages", [])
+
     def list_unread_messages(self, max_results: int = 5) -> List[Dict]:
         if not self.service:
             raise RuntimeError("Serviço Gmail não autenticado")
         try:
-            response = (
-                self.service.users()
-                .messages()
-                .list(userId="me", q="is:unread", maxResults=max_results)
-                .execute()
-            )
-            
-            messages = response.get("messages", [])
-            return messages
+            return self._list_unread(max_results)
         except HttpError as e:
             logger.error(f"Erro ao listar mensagens: {e}")
             return []
@@ -133,116 +272,753 @@ class GmailService:
             logger.error(f"Erro inesperado ao listar mensagens: {e}")
             return []
 
+    def get_history_id(self) -> Optional[str]:
+        """Retorna o historyId atual da caixa postal"""
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        profile = self._execute(self.service.users().getProfile(userId="me"))
+        return profile.get("historyId")
+
+    def list_new_unread_since(self, start_history_id: str, max_results: int = 5) -> Tuple[List[Dict], str, bool]:
+        """
+        Lista as mensagens não lidas adicionadas desde start_history_id (users.history.list)
+
+        Os registros são lidos em ordem cronológica. Se houver mais de
+        max_results mensagens novas, retorna as mais antigas e um historyId que
+        cobre só os registros já retornados, para que a próxima sincronização
+        continue de onde esta parou.
+
+        Args:
+            start_history_id (str): historyId salvo na última sincronização
+            max_results (int): Número máximo de mensagens retornadas (um registro
+                da history nunca é dividido, então pode passar um pouco disso)
+
+        Returns:
+            Tuple[List[Dict], str, bool]: Mensagens ({"id", "threadId"}), o novo
+                historyId e se ainda há mensagens novas depois dele
+
+        Raises:
+            HttpError: 404 quando o historyId expirou (é preciso sincronizar tudo)
+        """
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        messages = []
+        seen = set()
+        cursor = start_history_id
+        page_token = None
+        while True:
+            request_kwargs = {
+                "userId": "me",
+                "startHistoryId": start_history_id,
+                "historyTypes": ["messageAdded"],
+            }
+            if page_token:
+                request_kwargs["pageToken"] = page_token
+            response = self._execute(self.service.users().history().list(**request_kwargs))
+            for record in response.get("history", []):
+                if len(messages) >= max_results:
+                    # Limite atingido: o cursor fica no último registro retornado
+                    messages.reverse()
+                    return messages, cursor, True
+                for added in record.get("messagesAdded", []):
+                    message = added.get("message", {})
+                    message_id = message.get("id")
+                    if message_id and message_id not in seen and "UNREAD" in message.get("labelIds", []):
+                        seen.add(message_id)
+                        messages.append({"id": message_id, "threadId": message.get("threadId")})
+                cursor = record.get("id", cursor)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                # Tudo lido: avança até o historyId atual da caixa postal
+                cursor = response.get("historyId", cursor)
+                break
+        # A history vem em ordem cronológica; o preview mostra as mais recentes primeiro
+        messages.reverse()
+        return messages, cursor, False
+
+    def sync_unread_messages(self, history_id: Optional[str], max_results: int = 5) -> Tuple[List[Dict], Optional[str], bool, bool]:
+        """
+        Sincronização incremental das mensagens não lidas
+
+        Com um historyId salvo, busca apenas as mensagens novas desde então. Sem
+        historyId, ou quando ele expirou (404), faz a listagem completa.
+
+        Args:
+            history_id (Optional[str]): historyId da última sincronização
+            max_results (int): Número máximo de mensagens retornadas
+
+        Returns:
+            Tuple[List[Dict], Optional[str], bool, bool]: Mensagens, novo historyId,
+                se foi sincronização completa e se ficaram mensagens novas para a próxima
+        """
+        if history_id:
+            try:
+                messages, new_history_id, has_more = self.list_new_unread_since(history_id, max_results)
+                return messages, new_history_id, False, has_more
+            except HttpError as e:
+                if getattr(getattr(e, "resp", None), "status", None) != 404:
+                    raise
+                logger.info(f"historyId {history_id} expirado, fazendo sincronização completa")
+
+        # historyId obtido antes da listagem: nada que chegue no meio se perde.
+        # Erros da listagem sobem: devolver [] com o historyId novo faria o
+        # chamador salvá-lo e pular essas mensagens para sempre
+        new_history_id = self.get_history_id()
+        return self._list_unread(max_results), new_history_id, True, False
+
     def get_message_full(self, message_id: str) -> Optional[Dict]:
         if not self.service:
             raise RuntimeError("Serviço Gmail não autenticado")
         try:
-            msg = (
+            msg = self._execute(
                 self.service.users()
                 .messages()
                 .get(userId="me", id=message_id, format="full")
-                .execute()
             )
             return msg
         except HttpError as e:
             logger.error(f"Erro ao obter mensagem {message_id}: {e}")
             return None
 
-    @staticmethod
-    def _extract_payload_text(payload: Dict) -> str:
-        # Prefere text/plain; fallback para text/html (sem sanitização pesada neste MVP)
-        def decode_part(body_data: str) -> str:
-            try:
-                return base64.urlsafe_b64decode(body_data.encode("UTF-8")).decode(
-                    "utf-8", errors="ignore"
+    def get_messages_batch(self, message_ids: List[str], message_format: str = "full", **params) -> List[Optional[Dict]]:
+        """
+        Obtém várias mensagens usando o endpoint batch HTTP do Gmail
+
+        Cada batch agrupa até GMAIL_BATCH_SIZE requisições em um único round trip.
+        A ordem de entrada é preservada e falhas são isoladas por mensagem.
+
+        Args:
+            message_ids (List[str]): IDs das mensagens
+            message_format (str): Formato da mensagem na API (full, metadata, minimal, raw)
+            **params: Parâmetros extras de messages.get (ex.: fields, metadataHeaders)
+
+        Returns:
+            List[Optional[Dict]]: Mensagens na mesma ordem dos IDs (None para as que falharam)
+        """
+        return self._get_messages_requests([(message_id, message_format, params) for message_id in message_ids])
+
+    def _get_messages_requests(self, requests: List[Tuple[str, str, Dict]]) -> List[Optional[Dict]]:
+        """
+        Executa vários messages.get, cada um com formato e parâmetros próprios,
+        em batches de até GMAIL_BATCH_SIZE (mesma ordem da entrada, None nas falhas)
+        """
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        results: List[Optional[Dict]] = [None] * len(requests)
+
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                logger.error(f"Erro ao obter mensagem {requests[index][0]}: {exception}")
+                return
+            results[index] = response
+
+        for start in range(0, len(requests), GMAIL_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index in range(start, min(start + GMAIL_BATCH_SIZE, len(requests))):
+                message_id, message_format, params = requests[index]
+                batch.add(
+                    self.service.users().messages().get(
+                        userId="me", id=message_id, format=message_format, **params
+                    ),
+                    request_id=str(index),
                 )
-            except Exception:
-                return ""
-
-        mime_type = payload.get("mimeType", "")
-        body = payload.get("body", {})
-        data = body.get("data")
-
-        if mime_type == "text/plain" and data:
-            return decode_part(data)
-
-        if mime_type == "multipart/alternative" or mime_type.startswith("multipart"):
-            parts = payload.get("parts", [])
-            plain = ""
-            html = ""
-            for p in parts:
-                p_type = p.get("mimeType", "")
-                p_body = p.get("body", {}).get("data")
-                if p_type == "text/plain" and p_body:
-                    plain = decode_part(p_body)
-                elif p_type == "text/html" and p_body:
-                    html = decode_part(p_body)
-            return plain or html
-
-        if mime_type == "text/html" and data:
-            return decode_part(data)
-
-        return ""
+            try:
+                self._execute(batch)
+            except Exception as e:
+                # Falha do batch inteiro (rede, auth): só as mensagens deste batch ficam sem resultado
+                logger.error(f"Erro no batch de mensagens do Gmail: {e}")
+        return results
+
+    def get_messages_for_preview(self, message_ids: List[str], include_attachments: bool = False) -> List[Optional[Dict]]:
+        """
+        Obtém os campos do preview sem baixar a árvore MIME completa
+
+        Cada mensagem gera duas respostas parciais, enviadas no mesmo batch (um
+        único round trip para até GMAIL_BATCH_SIZE / 2 mensagens): format=metadata
+        só com Subject/From/Message-ID, e format=full restrito aos dados das
+        partes (sem cabeçalhos das partes nem conteúdo de anexos).
+
+        A máscara fields não filtra por mimeType: quando text/plain e text/html
+        são partes irmãs (multipart/alternative), as duas chegam na mesma
+        resposta, e só a escolhida por _find_text_part é decodificada. Partes
+        além de MIME_FIELDS_DEPTH níveis (encaminhadas dentro de multipart/mixed)
+        ficam fora da máscara; essas mensagens são buscadas de novo em format=full.
+
+        Args:
+            message_ids (List[str]): IDs das mensagens
+            include_attachments (bool): Inclui a lista de anexos (nome, tipo, tamanho, attachmentId)
+
+        Returns:
+            List[Optional[Dict]]: Campos de cada mensagem (como extract_email_fields), None para as que falharam
+        """
+        metadata_params = {"metadataHeaders": METADATA_HEADERS, "fields": METADATA_FIELDS}
+        body_params = {"fields": f"id,payload({_parts_fields(MIME_FIELDS_DEPTH, include_attachments)})"}
+        responses = self._get_messages_requests([
+            request
+            for message_id in message_ids
+            for request in ((message_id, "metadata", metadata_params), (message_id, "full", body_params))
+        ])
+        metadata, bodies = responses[0::2], responses[1::2]
+
+        truncated = [index for index, body in enumerate(bodies) if body and self._has_unresolved_parts(body.get("payload", {}))]
+        if truncated:
+            logger.warning(
+                f"Árvore MIME além de {MIME_FIELDS_DEPTH} níveis em {len(truncated)} mensagem(ns); "
+                "buscando em format=full"
+            )
+            for index, full in zip(truncated, self.get_messages_batch([message_ids[index] for index in truncated], "full")):
+                bodies[index] = full
+
+        results: List[Optional[Dict]] = [None] * len(message_ids)
+        for index, meta in enumerate(metadata):
+            if not meta:
+                continue
+            payload = dict((bodies[index] or {}).get("payload", {}))
+            payload["headers"] = meta.get("payload", {}).get("headers", [])
+            fields = self.extract_email_fields({"id": meta.get("id"), "threadId": meta.get("threadId"), "payload": payload})
+            if not fields["text"]:
+                # Sem corpo de texto (ou falha ao obtê-lo): usa o snippet do Gmail
+                fields["text"] = meta.get("snippet", "")
+            if include_attachments:
+                fields["attachments"] = self._list_attachments(payload)
+            results[index] = fields
+        return results
+
+    @staticmethod
+    def _has_unresolved_parts(payload: Dict) -> bool:
+        """Há partes multipart cujos filhos ficaram fora da máscara fields (árvore truncada)"""
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            if part.get("mimeType", "").startswith("multipart") and "parts" not in part:
+                return True
+            stack.extend(part.get("parts", []))
+        return False
+
+    @staticmethod
+    def _list_attachments(payload: Dict) -> List[Dict]:
+        """Lista os anexos da árvore MIME (sem conteúdo)"""
+        attachments = []
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            body = part.get("body", {})
+            if part.get("filename") and body.get("attachmentId"):
+                attachments.append({
+                    "filename": part["filename"],
+                    "mimeType": part.get("mimeType", ""),
+                    "size": body.get("size", 0),
+                    "attachmentId": body["attachmentId"],
+                })
+            stack.extend(reversed(part.get("parts", [])))
+        return attachments
+
+    def get_attachment(self, message_id: str, attachment_id: str) -> Optional[bytes]:
+        """Baixa o conteúdo de um anexo (só quando explicitamente pedido)"""
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        try:
+            attachment = self._execute(
+                self.service.users().messages().attachments().get(userId="me", messageId=message_id, id=attachment_id)
+            )
+            return base64.urlsafe_b64decode(attachment.get("data", "").encode("UTF-8"))
+        except HttpError as e:
+            logger.error(f"Erro ao obter anexo {attachment_id} da mensagem {message_id}: {e}")
+            return None
+
+    @staticmethod
+    def _find_text_part(payload: Dict) -> Optional[Dict]:
+        """
+        Percorre a árvore MIME (iterativo, em ordem de documento) atrás da melhor parte de texto
+
+        Prefere a primeira text/plain com conteúdo; senão a primeira text/html.
+        Anexos (partes com filename) são ignorados e nada é decodificado aqui.
+        """
+        html_part = None
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            mime_type = part.get("mimeType", "")
+            if mime_type.startswith("multipart"):
+                stack.extend(reversed(part.get("parts", [])))
+                continue
+            if part.get("filename") or not part.get("body", {}).get("data"):
+                continue
+            if mime_type == "text/plain":
+                return part
+            if mime_type == "text/html" and html_part is None:
+                html_part = part
+        return html_part
+
+    @staticmethod
+    def _decode_body(body_data: str, max_bytes: int = MAX_BODY_BYTES) -> str:
+        """Decodifica só o prefixo base64url necessário para max_bytes bytes de conteúdo"""
+        # Cada 4 caracteres base64 viram 3 bytes
+        prefix = body_data[:-(-max_bytes // 3) * 4]
+        try:
+            return base64.urlsafe_b64decode(prefix + "=" * (-len(prefix) % 4)).decode("utf-8", errors="ignore")
+        except Exception:
+            return ""
+
+    @staticmethod
+    def _iter_decoded(body_data: str, max_bytes: int):
+        """Decodifica o corpo base64url em pedaços de texto, sob demanda, até max_bytes bytes"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        # Pedaços com múltiplos de 4 caracteres base64 (3 bytes cada)
+        step = HTML_DECODE_CHUNK // 3 * 4
+        end = min(len(body_data), -(-max_bytes // 3) * 4)
+        try:
+            for start in range(0, end, step):
+                piece = body_data[start:min(start + step, end)]
+                yield decoder.decode(base64.urlsafe_b64decode(piece + "=" * (-len(piece) % 4)))
+            yield decoder.decode(b"", final=True)
+        except Exception:
+            return
+
+    @classmethod
+    def _extract_payload_text(cls, payload: Dict) -> str:
+        # Prefere text/plain; text/html é convertido em texto em streaming
+        part = cls._find_text_part(payload)
+        if part is None:
+            return ""
+        if part.get("mimeType") == "text/html":
+            return html_to_text(cls._iter_decoded(part["body"]["data"], MAX_HTML_BYTES))
+        return cls._decode_body(part["body"]["data"])
 
     def extract_email_fields(self, message: Dict) -> Dict:
         payload = message.get("payload", {})
         headers = payload.get("headers", [])
         subject = ""
         from_addr = ""
+        rfc_message_id = ""
         for h in headers:
             name = h.get("name", "").lower()
             if name == "subject":
                 subject = h.get("value", "")
             if name == "from":
                 from_addr = h.get("value", "")
-        text = self._extract_payload_text(payload)
+            if name == "message-id":
+                rfc_message_id = h.get("value", "")
+        # Só a mensagem nova: histórico citado e assinatura ocupariam a janela do classificador
+        text = strip_quoted_reply(self._extract_payload_text(payload))
         return {
             "id": message.get("id"),
             "threadId": message.get("threadId"),
             "subject": subject,
             "from": from_addr,
+            "rfcMessageId": rfc_message_id,
             "text": text,
         }
 
+    @staticmethod
+    def _build_reply_raw(to_email: str, subject: str, body: str, in_reply_to: Optional[str] = None) -> str:
+        """Monta a mensagem de resposta (MIME) codificada para o campo raw da API"""
+        from email.mime.text import MIMEText
+
+        message = MIMEText(body)
+        message["to"] = to_email
+        message["subject"] = f"Re: {subject}" if not subject.lower().startswith("re:") else subject
+        if in_reply_to:
+            # Necessário para o Gmail manter a resposta na mesma conversa
+            message["In-Reply-To"] = in_reply_to
+            message["References"] = in_reply_to
+        return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
     def send_reply(self, to_email: str, subject: str, body: str, thread_id: Optional[str] = None) -> bool:
         if not self.service:
             raise RuntimeError("Serviço Gmail não autenticado")
         try:
-            from email.mime.text import MIMEText
-
-            message = MIMEText(body)
-            message["to"] = to_email
-            message["subject"] = f"Re: {subject}" if not subject.lower().startswith("re:") else subject
-
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+            raw_message = self._build_reply_raw(to_email, subject, body)
             create_kwargs = {"userId": "me", "body": {"raw": raw_message}}
             if thread_id:
                 create_kwargs["body"]["threadId"] = thread_id
 
-            sent = self.service.users().messages().send(**create_kwargs).execute()
+            sent = self._execute(self.service.users().messages().send(**create_kwargs))
             logger.info(f"Mensagem enviada: {sent.get('id')}")
             return True
         except HttpError as e:
             logger.error(f"Erro ao enviar mensagem: {e}")
             return False
 
+    def _execute_batch_with_retry(self, request_factories: List[Callable]) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Executa requisições via batch HTTP, repetindo as que falharem com 429/5xx
+
+        As requisições são recriadas a cada tentativa (por isso fábricas, não
+        objetos HttpRequest), com backoff exponencial e jitter entre as rodadas.
+
+        Returns:
+            List[Tuple[Optional[Dict], Optional[Exception]]]: (resposta, erro) na ordem de entrada
+        """
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        results: List[Tuple[Optional[Dict], Optional[Exception]]] = [(None, None)] * len(request_factories)
+        pending = list(range(len(request_factories)))
+
+        def on_response(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        for attempt in range(GMAIL_MAX_RETRIES + 1):
+            if attempt:
+                delay = GMAIL_RETRY_BASE_DELAY * (2 ** (attempt - 1)) * (1 + random.random())
+                logger.info(f"Repetindo {len(pending)} requisições do Gmail em {delay:.1f}s (tentativa {attempt + 1})")
+                time.sleep(delay)
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                chunk = pending[start:start + GMAIL_BATCH_SIZE]
+                batch = self.service.new_batch_http_request(callback=on_response)
+                for index in chunk:
+                    batch.add(request_factories[index](), request_id=str(index))
+                try:
+                    self._execute(batch)
+                except Exception as e:
+                    logger.error(f"Erro no batch de requisições do Gmail: {e}")
+                    for index in chunk:
+                        results[index] = (None, e)
+            pending = [index for index in pending if results[index][1] is not None and _is_retryable(results[index][1])]
+            if not pending:
+                break
+        return results
+
+    def _threads_with_drafts(self, thread_ids: List[str]) -> Tuple[set, Dict[str, Exception]]:
+        """
+        Verifica quais conversas já têm rascunho (mensagem com label DRAFT)
+
+        Só as conversas informadas são consultadas, com threads.get em batch
+        restrito aos labels das mensagens.
+
+        Returns:
+            Tuple[set, Dict[str, Exception]]: (threadIds com rascunho, erros por threadId)
+        """
+        def factory(thread_id: str) -> Callable:
+            return lambda: self.service.users().threads().get(
+                userId="me", id=thread_id, format="minimal", fields="id,messages/labelIds"
+            )
+
+        drafted, errors = set(), {}
+        for thread_id, (response, error) in zip(thread_ids, self._execute_batch_with_retry([factory(t) for t in thread_ids])):
+            if error is not None or response is None:
+                errors[thread_id] = error or RuntimeError("Resposta vazia")
+            elif any("DRAFT" in message.get("labelIds", []) for message in response.get("messages", [])):
+                drafted.add(thread_id)
+        return drafted, errors
+
+    def create_drafts_batch(self, drafts: List[Dict]) -> List[Dict]:
+        """
+        Cria rascunhos de resposta em lote (users.drafts.create via batch HTTP)
+
+        Conversas que já têm rascunho (de um preview anterior ou do próprio
+        usuário) são puladas, assim como um segundo item da mesma conversa no
+        lote, para que repetir o preview não duplique rascunhos. Respostas
+        429/5xx são repetidas; numa falha de transporte o servidor pode ter
+        criado o rascunho, então a conversa é conferida de novo antes de repetir
+        (itens sem threadId não são repetidos).
+
+        Args:
+            drafts (List[Dict]): Itens com to, subject, body e, opcionalmente,
+                messageId, threadId e rfcMessageId (para manter a conversa)
+
+        Returns:
+            List[Dict]: Manifesto na ordem de entrada com messageId, threadId,
+                status ("created", "skipped" ou "failed"), draftId e error
+        """
+        def factory(item: Dict) -> Callable:
+            message = {"raw": self._build_reply_raw(
+                item["to"], item.get("subject", ""), item["body"], item.get("rfcMessageId")
+            )}
+            if item.get("threadId"):
+                message["threadId"] = item["threadId"]
+            return lambda: self.service.users().drafts().create(userId="me", body={"message": message})
+
+        manifest = [{"messageId": item.get("messageId"), "threadId": item.get("threadId")} for item in drafts]
+        drafted_threads, check_errors = self._threads_with_drafts(
+            list(dict.fromkeys(item["threadId"] for item in drafts if item.get("threadId")))
+        )
+
+        pending = []
+        for entry, item in zip(manifest, drafts):
+            thread_id = item.get("threadId")
+            if thread_id in check_errors:
+                # Sem saber se já há rascunho, não cria (evita duplicata)
+                entry.update({"status": "failed", "error": f"Erro ao verificar rascunhos da conversa: {check_errors[thread_id]}"})
+                continue
+            if thread_id and thread_id in drafted_threads:
+                entry["status"] = "skipped"
+                continue
+            if thread_id:
+                drafted_threads.add(thread_id)
+            pending.append((entry, item))
+
+        for attempt in range(GMAIL_MAX_RETRIES + 1):
+            unconfirmed = []
+            results = self._execute_batch_with_retry([factory(item) for _, item in pending])
+            for (entry, item), (response, error) in zip(pending, results):
+                if error is None and response:
+                    entry.update({"status": "created", "draftId": response.get("id")})
+                elif error is not None and not isinstance(error, HttpError) and item.get("threadId") and attempt < GMAIL_MAX_RETRIES:
+                    unconfirmed.append((entry, item))
+                else:
+                    logger.error(f"Erro ao criar rascunho para {item.get('messageId')}: {error}")
+                    entry.update({"status": "failed", "error": str(error) if error else "Resposta vazia"})
+            if not unconfirmed:
+                break
+            # Falha de transporte: o rascunho pode ter sido criado mesmo assim
+            logger.warning(f"Falha de transporte em {len(unconfirmed)} rascunhos; conferindo as conversas antes de repetir")
+            time.sleep(GMAIL_RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+            drafted, errors = self._threads_with_drafts([item["threadId"] for _, item in unconfirmed])
+            pending = []
+            for entry, item in unconfirmed:
+                thread_id = item["threadId"]
+                if thread_id in drafted:
+                    # Criado antes da falha; o ID do rascunho não é conhecido
+                    entry.update({"status": "created", "draftId": None})
+                elif thread_id in errors:
+                    entry.update({"status": "failed", "error": f"Erro ao verificar rascunhos da conversa: {errors[thread_id]}"})
+                else:
+                    pending.append((entry, item))
+            if not pending:
+                break
+        created = sum(1 for entry in manifest if entry["status"] == "created")
+        skipped = sum(1 for entry in manifest if entry["status"] == "skipped")
+        logger.info(f"Rascunhos: {created} criados, {skipped} já existentes, {len(manifest) - created - skipped} falhas")
+        return manifest
+
     def mark_as_read(self, message_id: str) -> bool:
         """Marca mensagem como lida (remove label UNREAD)"""
         if not self.service:
             raise RuntimeError("Serviço Gmail não autenticado")
         try:
-            logger.info(f"Tentando marcar mensagem {message_id} como lida...")
             # Remove o label UNREAD da mensagem
-            result = self.service.users().messages().modify(
+            self._execute(self.service.users().messages().modify(
                 userId="me",
                 id=message_id,
                 body={"removeLabelIds": ["UNREAD"]}
-            ).execute()
-            logger.info(f"Mensagem {message_id} marcada como lida. Resultado: {result}")
+            ))
+            logger.info(f"Mensagem {message_id} marcada como lida")
             return True
         except HttpError as e:
             logger.error(f"Erro ao marcar mensagem como lida: {e}")
             logger.error(f"Detalhes do erro: {e.error_details}")
             return False
 
+    def batch_modify(self, message_ids: List[str], add_label_ids: Optional[List[str]] = None,
+                     remove_label_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Altera os labels de várias mensagens com users.messages.batchModify
+
+        Cada chamada cobre até BATCH_MODIFY_MAX_IDS mensagens; uma falha afeta
+        apenas o seu bloco de IDs.
+
+        Args:
+            message_ids (List[str]): IDs das mensagens
+            add_label_ids (Optional[List[str]]): IDs dos labels a adicionar
+            remove_label_ids (Optional[List[str]]): IDs dos labels a remover
+
+        Returns:
+            Dict: {"modified": quantidade alterada, "failed": IDs que falharam}
+        """
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        # Remove duplicados preservando a ordem
+        message_ids = list(dict.fromkeys(message_id for message_id in message_ids if message_id))
+        body = {}
+        if add_label_ids:
+            body["addLabelIds"] = list(add_label_ids)
+        if remove_label_ids:
+            body["removeLabelIds"] = list(remove_label_ids)
+        if not message_ids or not body:
+            return {"modified": 0, "failed": []}
+
+        modified = 0
+        failed: List[str] = []
+        for start in range(0, len(message_ids), BATCH_MODIFY_MAX_IDS):
+            chunk = message_ids[start:start + BATCH_MODIFY_MAX_IDS]
+            try:
+                self._execute(self.service.users().messages().batchModify(
+                    userId="me", body={"ids": chunk, **body}
+                ))
+                modified += len(chunk)
+            except HttpError as e:
+                logger.error(f"Erro no batchModify de {len(chunk)} mensagens: {e}")
+                failed.extend(chunk)
+        logger.info(f"batchModify: {modified} mensagens alteradas, {len(failed)} falhas")
+        return {"modified": modified, "failed": failed}
+
+    def mark_as_read_bulk(self, message_ids: List[str]) -> Dict:
+        """Marca várias mensagens como lidas em chamadas batchModify"""
+        return self.batch_modify(message_ids, remove_label_ids=["UNREAD"])
+
+    def get_or_create_label(self, name: str) -> Optional[str]:
+        """
+        Retorna o ID do label com este nome, criando-o se ainda não existir
+
+        A lista de labels do usuário é lida uma vez e mantida em cache no
+        serviço (que é reaproveitado pelo pool).
+        """
+        if not self.service:
+            raise RuntimeError("Serviço Gmail não autenticado")
+        try:
+            if self._label_ids is None:
+                response = self._execute(self.service.users().labels().list(userId="me"))
+                self._label_ids = {label["name"]: label["id"] for label in response.get("labels", [])}
+            if name in self._label_ids:
+                return self._label_ids[name]
+            label = self._execute(self.service.users().labels().create(
+                userId="me",
+                body={"name": name, "labelListVisibility": "labelShow", "messageListVisibility": "show"},
+            ))
+            self._label_ids[name] = label["id"]
+            logger.info(f"Label {name} criado: {label['id']}")
+            return label["id"]
+        except HttpError as e:
+            if getattr(getattr(e, "resp", None), "status", None) == 409:
+                # Criado por outra requisição em paralelo: relê a lista de labels
+                try:
+                    response = self._execute(self.service.users().labels().list(userId="me"))
+                    self._label_ids = {label["name"]: label["id"] for label in response.get("labels", [])}
+                    if name in self._label_ids:
+                        return self._label_ids[name]
+                except HttpError:
+                    pass
+            logger.error(f"Erro ao obter/criar label {name}: {e}")
+            return None
+
+    def apply_category_labels(self, categories: Dict[str, str], mark_read: bool = False) -> Dict:
+        """
+        Aplica o label de categoria (GMAIL_LABEL_PREFIX/<categoria>) às mensagens
+
+        As mensagens são agrupadas por categoria, com uma chamada batchModify
+        por grupo (e por bloco de até BATCH_MODIFY_MAX_IDS IDs).
+
+        Args:
+            categories (Dict[str, str]): ID da mensagem -> categoria (ex.: "Produtivo")
+            mark_read (bool): Também remove o label UNREAD
+
+        Returns:
+            Dict: {"modified", "failed", "labels": categoria -> ID do label}
+        """
+        groups: Dict[str, List[str]] = {}
+        for message_id, category in categories.items():
+            if message_id and category:
+                groups.setdefault(category, []).append(message_id)
+
+        modified = 0
+        failed: List[str] = []
+        labels: Dict[str, str] = {}
+        for category, message_ids in groups.items():
+            label_id = self.get_or_create_label(f"{GMAIL_LABEL_PREFIX}/{category}")
+            if label_id is None:
+                failed.extend(message_ids)
+                continue
+            labels[category] = label_id
+            result = self.batch_modify(
+                message_ids, add_label_ids=[label_id], remove_label_ids=["UNREAD"] if mark_read else None
+            )
+            modified += result["modified"]
+            failed.extend(result["failed"])
+        return {"modified": modified, "failed": failed, "labels": labels}
+
+
+class GmailServicePool:
+    """
+    Pool de GmailService autenticados por usuário, com TTL e eviction LRU
+
+    Evita refazer a autenticação e o build() do cliente (que interpreta o
+    documento de discovery) a cada requisição. A entrada é descartada quando
+    as credenciais do usuário mudam, quando expira ou via invalidate().
+    """
+
+    def __init__(self, ttl_seconds: int = 900, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (expires_at, fingerprints, service)
+        self._lock = threading.Lock()
+        # Um lock por usuário: requisições simultâneas fazem uma única autenticação/refresh
+        self._user_locks: Dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fingerprint(credentials: dict) -> str:
+        return hashlib.sha256(json.dumps(credentials, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _user_lock(self, user_id) -> threading.Lock:
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def get(self, user_id, credentials: dict,
+            on_credentials_refreshed: Optional[Callable[[dict], None]] = None) -> Optional[GmailService]:
+        """
+        Retorna o serviço autenticado do usuário, criando-o se necessário
+
+        Args:
+            user_id: Identificador do usuário
+            credentials (dict): Credenciais do Gmail salvas para o usuário
+            on_credentials_refreshed: Callback para persistir credenciais renovadas
+
+        Returns:
+            Optional[GmailService]: Serviço autenticado, ou None se a autenticação falhar
+        """
+        fingerprint = self._fingerprint(credentials)
+        with self._user_lock(user_id):
+            with self._lock:
+                entry = self._entries.get(user_id)
+                service = None
+                if entry is not None:
+                    expires_at, fingerprints, pooled = entry
+                    if expires_at >= time.monotonic() and fingerprint in fingerprints:
+                        self._entries.move_to_end(user_id)
+                        self.hits += 1
+                        service = pooled
+                    else:
+                        del self._entries[user_id]
+                if service is None:
+                    self.misses += 1
+
+            if service is not None:
+                # Refresh proativo antes de expirar, feito uma vez só por usuário
+                if service.refresh_if_needed():
+                    self._store(user_id, service, fingerprint)
+                return service
+
+            # Autenticação fora do lock do pool (pode envolver rede)
+            service = GmailService(user_credentials=credentials, on_credentials_refreshed=on_credentials_refreshed)
+            if not service.ensure_authenticated():
+                return None
+            self._store(user_id, service, fingerprint)
+            return service
+
+    def _store(self, user_id, service: GmailService, fingerprint: str):
+        """Guarda o serviço aceitando tanto as credenciais recebidas quanto as renovadas"""
+        fingerprints = {fingerprint, self._fingerprint(service.user_credentials)}
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, fingerprints, service)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                evicted_user, _ = self._entries.popitem(last=False)
+                self._user_locks.pop(evicted_user, None)
+
+    def invalidate(self, user_id):
+        """Remove o serviço do usuário (ex.: ao desconectar o Gmail)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        """Retorna os contadores do pool"""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def build_gmail_service_pool() -> GmailServicePool:
+    """
+    Cria o pool de serviços Gmail a partir das variáveis de ambiente
 
+    GMAIL_POOL_TTL: tempo de vida de um serviço no pool, em segundos
+    GMAIL_POOL_MAX_ENTRIES: número máximo de usuários no pool (LRU)
+    """
+    return GmailServicePool(
+        ttl_seconds=int(os.getenv("GMAIL_POOL_TTL", "900")),
+        max_entries=int(os.getenv("GMAIL_POOL_MAX_ENTRIES", "256")),
+    )
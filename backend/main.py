@@ -1,10 +1,13 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 import os
 import sys
+import json
+import asyncio
+import functools
 from pathlib import Path
 
 # Configurar PYTHONPATH para importações funcionarem corretamente
@@ -24,7 +27,7 @@ from dotenv import load_dotenv
 # Importações com fallback robusto para diferentes ambientes
 def import_modules():
     """Função para importar módulos com fallback para diferentes estruturas de path"""
-    global EmailClassifier, ResponseGenerator, TextProcessor, GmailService, get_db, create_tables, get_current_user, verify_firebase_token, User
+    global EmailClassifier, ResponseGenerator, StreamInterruptedError, TextProcessor, FileExtractor, build_result_cache, make_cache_key, build_near_duplicate_index, build_combined_pipeline, build_speculative_pipeline, GmailService, build_gmail_service_pool, get_db, create_tables, get_current_user, verify_firebase_token, User
     
     import importlib.util
     
@@ -46,9 +49,14 @@ def import_modules():
     # Primeira tentativa: imports relativos 
     try:
         from models.classifier import EmailClassifier
-        from models.response_generator import ResponseGenerator
+        from models.response_generator import ResponseGenerator, StreamInterruptedError
+        from models.combined_pipeline import build_combined_pipeline
+        from models.speculative_pipeline import build_speculative_pipeline
         from utils.text_processor import TextProcessor
-        from integrations.gmail_service import GmailService
+        from utils.file_extractor import FileExtractor
+        from utils.result_cache import build_result_cache, make_cache_key
+        from utils.near_duplicate import build_near_duplicate_index
+        from integrations.gmail_service import GmailService, build_gmail_service_pool
         from database import get_db, create_tables
         from auth.firebase_auth import get_current_user, verify_firebase_token
         from models.user import User
@@ -60,9 +68,14 @@ def import_modules():
     # Segunda tentativa: imports absolutos com prefixo backend
     try:
         from backend.models.classifier import EmailClassifier
-        from backend.models.response_generator import ResponseGenerator
+        from backend.models.response_generator import ResponseGenerator, StreamInterruptedError
+        from backend.models.combined_pipeline import build_combined_pipeline
+        from backend.models.speculative_pipeline import build_speculative_pipeline
         from backend.utils.text_processor import TextProcessor
-        from backend.integrations.gmail_service import GmailService
+        from backend.utils.file_extractor import FileExtractor
+        from backend.utils.result_cache import build_result_cache, make_cache_key
+        from backend.utils.near_duplicate import build_near_duplicate_index
+        from backend.integrations.gmail_service import GmailService, build_gmail_service_pool
         from backend.database import get_db, create_tables
         from backend.auth.firebase_auth import get_current_user, verify_firebase_token
         from backend.models.user import User
@@ -105,6 +118,28 @@ def import_modules():
         else:
             raise ImportError("Não foi possível importar TextProcessor")
         
+        # Importar file extractor
+        file_extractor_module = safe_import_from_path("file_extractor", backend_root / "utils" / "file_extractor.py")
+        if file_extractor_module:
+            FileExtractor = file_extractor_module.FileExtractor
+        else:
+            raise ImportError("Não foi possível importar FileExtractor")
+        
+        # Importar result cache
+        result_cache_module = safe_import_from_path("result_cache", backend_root / "utils" / "result_cache.py")
+        if result_cache_module:
+            build_result_cache = result_cache_module.build_result_cache
+            make_cache_key = result_cache_module.make_cache_key
+        else:
+            raise ImportError("Não foi possível importar result_cache")
+        
+        # Importar near duplicate index
+        near_duplicate_module = safe_import_from_path("near_duplicate", backend_root / "utils" / "near_duplicate.py")
+        if near_duplicate_module:
+            build_near_duplicate_index = near_duplicate_module.build_near_duplicate_index
+        else:
+            raise ImportError("Não foi possível importar near_duplicate")
+        
         # Importar classifier
         classifier_module = safe_import_from_path("classifier", backend_root / "models" / "classifier.py")
         if classifier_module:
@@ -116,13 +151,29 @@ def import_modules():
         response_module = safe_import_from_path("response_generator", backend_root / "models" / "response_generator.py")
         if response_module:
             ResponseGenerator = response_module.ResponseGenerator
+            StreamInterruptedError = response_module.StreamInterruptedError
         else:
             raise ImportError("Não foi possível importar ResponseGenerator")
         
+        # Importar combined pipeline
+        combined_module = safe_import_from_path("combined_pipeline", backend_root / "models" / "combined_pipeline.py")
+        if combined_module:
+            build_combined_pipeline = combined_module.build_combined_pipeline
+        else:
+            raise ImportError("Não foi possível importar combined_pipeline")
+        
+        # Importar speculative pipeline
+        speculative_module = safe_import_from_path("speculative_pipeline", backend_root / "models" / "speculative_pipeline.py")
+        if speculative_module:
+            build_speculative_pipeline = speculative_module.build_speculative_pipeline
+        else:
+            raise ImportError("Não foi possível importar speculative_pipeline")
+        
         # Importar gmail service
         gmail_module = safe_import_from_path("gmail_service", backend_root / "integrations" / "gmail_service.py")
         if gmail_module:
             GmailService = gmail_module.GmailService
+            build_gmail_service_pool = gmail_module.build_gmail_service_pool
         else:
             raise ImportError("Não foi possível importar GmailService")
         
@@ -172,6 +223,13 @@ classifier = None
 response_generator = None
 text_processor = None
 gmail_service = None
+file_extractor = None
+result_cache = None
+near_duplicate_index = None
+near_duplicate_initialized = False
+pipeline = None
+pipeline_initialized = False
+gmail_pool = None
 
 def get_components():
     """Inicializa os componentes se necessário"""
@@ -190,8 +248,219 @@ def get_components():
     # Garantir sincronização do cliente Gemini mesmo em chamadas subsequentes
     if hasattr(response_generator, 'gemini_client') and response_generator.gemini_client:
         classifier.set_gemini_client(response_generator.gemini_client)
+    # Treino do aprendizado online roda em segundo plano no event loop
+    if classifier.online_learner is not None:
+        classifier.online_learner.start()
     return classifier, response_generator, text_processor
 
+def get_file_extractor():
+    """Inicializa o backend de extração de arquivos se necessário"""
+    global file_extractor
+    if file_extractor is None:
+        _, _, processor = get_components()
+        file_extractor = FileExtractor(text_processor=processor)
+    return file_extractor
+
+def get_result_cache():
+    """Inicializa o cache de resultados se necessário"""
+    global result_cache
+    if result_cache is None:
+        result_cache = build_result_cache()
+    return result_cache
+
+def get_near_duplicate_index():
+    """Inicializa o índice de quase-duplicatas (None quando desabilitado)"""
+    global near_duplicate_index, near_duplicate_initialized
+    if not near_duplicate_initialized:
+        near_duplicate_index = build_near_duplicate_index()
+        near_duplicate_initialized = True
+    return near_duplicate_index
+
+def get_pipeline():
+    """Inicializa o pipeline de classificação + resposta de PIPELINE_MODE (None no modo separate)"""
+    global pipeline, pipeline_initialized
+    if not pipeline_initialized:
+        classifier, response_generator, _ = get_components()
+        pipeline = (
+            build_combined_pipeline(classifier, response_generator)
+            or build_speculative_pipeline(classifier, response_generator)
+        )
+        pipeline_initialized = True
+    return pipeline
+
+def get_gmail_pool():
+    """Inicializa o pool de serviços Gmail autenticados por usuário se necessário"""
+    global gmail_pool
+    if gmail_pool is None:
+        gmail_pool = build_gmail_service_pool()
+    return gmail_pool
+
+async def get_user_gmail_service(user):
+    """
+    Serviço Gmail autenticado do usuário (via pool), persistindo tokens renovados
+
+    A autenticação/refresh pode esperar por rede ou pelo lock de um batch do
+    mesmo usuário em andamento, então roda fora do event loop.
+    """
+    try:
+        from auth.firebase_auth import update_user_gmail_tokens
+    except ImportError:
+        from backend.auth.firebase_auth import update_user_gmail_tokens
+    user_id = user.id
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+        get_gmail_pool().get,
+        user_id,
+        user.gmail_credentials,
+        on_credentials_refreshed=lambda credentials: update_user_gmail_tokens(user_id, credentials),
+    ))
+
+def _cache_version(classifier) -> str:
+    """Versão de modelo/prompt que compõe a chave do cache de resultados"""
+    # A versão do modelo online muda a cada mini-lote e não entra aqui: os
+    # resultados dele não vão para o cache (ver _store_result)
+    active_pipeline = get_pipeline()
+    return f"{EmailClassifier.PROMPT_VERSION}|{ResponseGenerator.PROMPT_VERSION}|gemini={classifier.gemini_client is not None}|mode={classifier.mode}|local={classifier.local_model.version if classifier.local_model is not None else None}|pipeline={active_pipeline.mode if active_pipeline is not None else 'separate'}"
+
+def _build_result(classification_result, response: str) -> dict:
+    """Monta o resultado do pipeline a partir da classificação e da resposta"""
+    return {
+        "category": classification_result.category,
+        "response": response,
+        "confidence": classification_result.confidence,
+        "method": classification_result.method,
+        "model_info": classification_result.model_info,
+    }
+
+def _lookup_reusable_result(cache, key: str, processed_text: str, version: str):
+    """Busca no cache exato e, em seguida, no índice de quase-duplicatas"""
+    cached = cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
+    index = get_near_duplicate_index()
+    if index is not None:
+        similar = index.lookup(processed_text)
+        if similar is not None and similar.get("version") == version:
+            result = {k: v for k, v in similar.items() if k != "version"}
+            # Promove para o cache exato: próximos envios do mesmo texto nem calculam o SimHash
+            cache.set(key, result)
+            return {**result, "cached": True, "near_duplicate": True}
+    return None
+
+def _store_result(cache, key: str, processed_text: str, version: str, classification_result, result: dict):
+    """Guarda o resultado no cache e no índice de quase-duplicatas (exceto erros e fallbacks)"""
+    # Resultados de erro não são reaproveitados
+    if classification_result.method == "error_fallback":
+        return
+    # Fallbacks por falha temporária do Gemini também não: a chave do cache diz
+    # gemini=True e o resultado seria servido por todo o TTL
+    classifier, response_generator, _ = get_components()
+    if classifier.gemini_client is not None and classification_result.method in ("local_model", "keywords_fallback"):
+        return
+    # O modelo online é retreinado a cada mini-lote; guardar o palpite dele
+    # congelaria uma versão já superada por todo o TTL
+    if classification_result.method == "local_model_online":
+        return
+    if response_generator.is_template_fallback(classification_result.category, processed_text, result["response"]):
+        return
+    cache.set(key, result)
+    index = get_near_duplicate_index()
+    if index is not None:
+        index.add(processed_text, {**result, "version": version})
+
+async def _alookup_reusable_results(cache, keys: list, processed_texts: list, version: str) -> list:
+    """
+    Versão assíncrona de _lookup_reusable_result para vários textos
+
+    Com o cache em banco (DatabaseResultCache) cada consulta é um SELECT
+    síncrono do SQLAlchemy, então todas rodam numa única ida ao executor,
+    fora do event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: [
+        _lookup_reusable_result(cache, key, processed_text, version)
+        for key, processed_text in zip(keys, processed_texts)
+    ])
+
+async def _astore_results(cache, keys: list, processed_texts: list, version: str, classifications: list, results: list):
+    """Versão assíncrona de _store_result (INSERT e despejo LRU fora do event loop)"""
+    def store():
+        for key, processed_text, classification_result, result in zip(keys, processed_texts, classifications, results):
+            _store_result(cache, key, processed_text, version, classification_result, result)
+    await asyncio.get_running_loop().run_in_executor(None, store)
+
+async def classify_and_respond(processed_text: str) -> dict:
+    """
+    Executa classificação + geração de resposta, reutilizando resultados em cache
+
+    A chave do cache combina o texto normalizado com as versões de prompt e a
+    disponibilidade do Gemini, para não servir respostas de template quando a IA
+    passou a estar configurada (e vice-versa).
+    """
+    classifier, response_generator, _ = get_components()
+    cache = get_result_cache()
+    version = _cache_version(classifier)
+    key = make_cache_key(processed_text, version)
+    
+    reusable, = await _alookup_reusable_results(cache, [key], [processed_text], version)
+    if reusable is not None:
+        return reusable
+    
+    active_pipeline = get_pipeline()
+    if active_pipeline is not None:
+        # combined: uma única chamada ao Gemini; speculative: resposta gerada em paralelo
+        classification_result, response = await active_pipeline.arun(processed_text)
+    else:
+        classification_result = await classifier.apredict(processed_text)
+        response = await response_generator.agenerate(classification_result.category, processed_text)
+    
+    result = _build_result(classification_result, response)
+    await _astore_results(cache, [key], [processed_text], version, [classification_result], [result])
+    return {**result, "cached": False}
+
+async def classify_and_respond_batch(processed_texts: list) -> list:
+    """
+    Versão em lote de classify_and_respond: os itens fora do cache são
+    classificados pelo Gemini em lotes (um prompt para vários emails)
+    """
+    classifier, response_generator, _ = get_components()
+    cache = get_result_cache()
+    version = _cache_version(classifier)
+    keys = [make_cache_key(text, version) for text in processed_texts]
+    
+    results = await _alookup_reusable_results(cache, keys, processed_texts, version)
+    misses = [index for index, reusable in enumerate(results) if reusable is None]
+    
+    active_pipeline = get_pipeline()
+    if active_pipeline is not None:
+        pairs = await active_pipeline.arun_batch([processed_texts[index] for index in misses])
+        classifications = [classification_result for classification_result, _ in pairs]
+        responses = [response for _, response in pairs]
+    else:
+        classifications = await classifier.apredict_batch([processed_texts[index] for index in misses])
+        # Respostas geradas em paralelo (limitadas pelo semáforo do Gemini)
+        responses = await asyncio.gather(*[
+            response_generator.agenerate(classification_result.category, processed_texts[index])
+            for index, classification_result in zip(misses, classifications)
+        ])
+    fresh = [_build_result(classification_result, response) for classification_result, response in zip(classifications, responses)]
+    await _astore_results(
+        cache, [keys[index] for index in misses], [processed_texts[index] for index in misses],
+        version, classifications, fresh
+    )
+    for index, result in zip(misses, fresh):
+        results[index] = {**result, "cached": False}
+    return results
+
+@app.on_event("shutdown")
+def shutdown_components():
+    """Libera recursos dos componentes ao encerrar a aplicação"""
+    if file_extractor is not None:
+        file_extractor.shutdown()
+    if near_duplicate_index is not None:
+        near_duplicate_index.save()
+    if classifier is not None and classifier.online_learner is not None:
+        classifier.online_learner.stop()
+
 @app.get("/auth/me")
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Obter informações do usuário atual"""
@@ -250,6 +519,7 @@ async def connect_gmail(
         except ImportError:
             from backend.auth.firebase_auth import update_user_gmail_credentials
         update_user_gmail_credentials(current_user, credentials, db)
+        get_gmail_pool().invalidate(current_user.id)
         return {
             "status": "connected",
             "message": "Gmail conectado com sucesso"
@@ -269,6 +539,7 @@ async def disconnect_gmail(
         except ImportError:
             from backend.auth.firebase_auth import disconnect_user_gmail
         disconnect_user_gmail(current_user, db)
+        get_gmail_pool().invalidate(current_user.id)
         return {
             "status": "disconnected",
             "message": "Gmail desconectado com sucesso"
@@ -392,6 +663,7 @@ async def gmail_oauth2_callback(
         except ImportError:
             from backend.auth.firebase_auth import update_user_gmail_credentials
         update_user_gmail_credentials(user, gmail_credentials, db)
+        get_gmail_pool().invalidate(user.id)
         
         # Retornar página HTML que redireciona automaticamente
         return HTMLResponse(f"""
@@ -547,22 +819,70 @@ async def classify_text(data: dict):
         # Processar texto
         processed_text = text_processor.process(text)
         
-        # Classificar
-        classification_result = classifier.predict(processed_text)
-        category = classification_result["category"]
+        # Classificar e gerar resposta (com cache por conteúdo)
+        return await classify_and_respond(processed_text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao processar email: {str(e)}")
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_classify_and_respond(processed_text: str):
+    """
+    Gera os eventos SSE: classificação assim que disponível, trechos da resposta
+    à medida que o Gemini os produz e, por fim, o resultado completo
+    """
+    try:
+        classifier, response_generator, _ = get_components()
+        cache = get_result_cache()
+        version = _cache_version(classifier)
+        key = make_cache_key(processed_text, version)
+        
+        reusable, = await _alookup_reusable_results(cache, [key], [processed_text], version)
+        if reusable is not None:
+            yield _sse_event("classification", {k: v for k, v in reusable.items() if k != "response"})
+            yield _sse_event("chunk", {"text": reusable["response"]})
+            yield _sse_event("done", reusable)
+            return
         
-        # Gerar resposta
-        response = response_generator.generate(category, processed_text)
+        classification_result = await classifier.apredict(processed_text)
+        yield _sse_event("classification", {**classification_result.to_dict(), "cached": False})
         
-        return {
-            "category": category,
-            "response": response,
-            "confidence": classification_result["confidence"],
-            "method": classification_result["method"],
-            "model_info": classification_result["model_info"]
-        }
+        chunks = []
+        try:
+            async for chunk in response_generator.astream(classification_result.category, processed_text):
+                chunks.append(chunk)
+                yield _sse_event("chunk", {"text": chunk})
+        except StreamInterruptedError as e:
+            # Resposta cortada no meio: não vai para o cache nem para o índice de quase-duplicados
+            yield _sse_event("error", {
+                "detail": f"Erro ao gerar resposta: {str(e)}",
+                "partial": True,
+                **_build_result(classification_result, "".join(chunks).strip()),
+            })
+            return
+        
+        result = _build_result(classification_result, "".join(chunks).strip())
+        await _astore_results(cache, [key], [processed_text], version, [classification_result], [result])
+        yield _sse_event("done", {**result, "cached": False})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar email: {str(e)}")
+        yield _sse_event("error", {"detail": f"Erro ao processar email: {str(e)}"})
+
+@app.post("/classify-text/stream")
+async def classify_text_stream(data: dict):
+    """Classifica email a partir de texto, transmitindo a resposta via Server-Sent Events"""
+    text = data.get("text", "")
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="Texto do email é obrigatório")
+    
+    _, _, text_processor = get_components()
+    processed_text = text_processor.process(text)
+    return StreamingResponse(
+        _stream_classify_and_respond(processed_text),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/classify-file")
 async def classify_file(file: UploadFile = File(...)):
@@ -574,28 +894,25 @@ async def classify_file(file: UploadFile = File(...)):
         
         # Obter componentes
         classifier, response_generator, text_processor = get_components()
+        extractor = get_file_extractor()
         
         # Ler conteúdo do arquivo
         content = await file.read()
+        if len(content) > extractor.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Arquivo excede o limite de {extractor.max_bytes} bytes")
         
-        # Processar arquivo
-        text = text_processor.process_file(content, file.filename)
-        
-        # Classificar
-        classification_result = classifier.predict(text)
-        category = classification_result["category"]
-        
-        # Gerar resposta
-        response = response_generator.generate(category, text)
+        # Processar arquivo fora do event loop
+        try:
+            text = await extractor.extract(content, file.filename)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Tempo limite excedido ao processar o arquivo")
         
-        return {
-            "category": category,
-            "response": response,
-            "confidence": classification_result["confidence"],
-            "method": classification_result["method"],
-            "model_info": classification_result["model_info"],
-            "filename": file.filename
-        }
+        # Classificar e gerar resposta (com cache por conteúdo)
+        result = await classify_and_respond(text)
+        result["filename"] = file.filename
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
 
@@ -668,6 +985,19 @@ async def health_check():
         # Retornar 500 com detalhe mínimo para ajudar debug em prod
         raise HTTPException(status_code=500, detail=f"Health check falhou: {str(e)}")
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores do cache de resultados (hits, misses e chamadas Gemini economizadas)"""
+    stats = get_result_cache().stats()
+    index = get_near_duplicate_index()
+    stats["near_duplicates"] = index.stats() if index is not None else None
+    learner = classifier.online_learner if classifier is not None else None
+    stats["online_learning"] = learner.stats() if learner is not None else None
+    active_pipeline = get_pipeline()
+    stats["speculation"] = active_pipeline.stats() if active_pipeline is not None and active_pipeline.mode == "speculative" else None
+    stats["gmail_pool"] = gmail_pool.stats() if gmail_pool is not None else None
+    return stats
+
 @app.get("/debug")
 async def debug_info():
     """Endpoint para debug da configuração"""
@@ -685,23 +1015,47 @@ async def debug_info():
 @app.get("/gmail/preview")
 async def gmail_preview(
     limit: int = 5,
-    current_user: User = Depends(get_current_user)
+    incremental: bool = False,
+    include_attachments: bool = False,
+    create_drafts: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
+    """
+    Preview das mensagens não lidas com classificação e resposta sugerida
+    
+    Com incremental=true, busca só as mensagens chegadas desde a última
+    sincronização (historyId salvo no usuário), caindo para a listagem
+    completa na primeira vez ou quando o historyId expira.
+
+    Com create_drafts=true, a resposta sugerida de cada email produtivo vira
+    um rascunho no Gmail (na mesma conversa), criados em lote; o manifesto
+    volta no campo drafts. Conversas que já têm rascunho são puladas
+    (status "skipped"), então repetir o preview não duplica rascunhos.
+    """
     try:
         # Verificar se o usuário tem Gmail conectado
         if not current_user.gmail_connected or not current_user.gmail_credentials:
             raise HTTPException(status_code=400, detail="Gmail não conectado. Conecte sua conta Gmail primeiro.")
         
-        # Criar serviço Gmail com credenciais do usuário
-        gmail_service = GmailService(user_credentials=current_user.gmail_credentials)
+        # Serviço Gmail autenticado reaproveitado do pool (por usuário)
+        gmail_service = await get_user_gmail_service(current_user)
         
-        if not gmail_service.ensure_authenticated():
+        if gmail_service is None:
             raise HTTPException(status_code=400, detail="Falha na autenticação Gmail. Reconecte sua conta Gmail.")
 
         classifier, response_generator, text_processor = get_components()
         
+        loop = asyncio.get_running_loop()
+        full_sync = True
+        has_more = False
         try:
-            messages = gmail_service.list_unread_messages(max_results=limit)
+            if incremental:
+                messages, history_id, full_sync, has_more = await loop.run_in_executor(
+                    None, gmail_service.sync_unread_messages, current_user.gmail_history_id, limit
+                )
+            else:
+                messages = await loop.run_in_executor(None, gmail_service.list_unread_messages, limit)
         except Exception as e:
             # Se for erro de credenciais inválidas, retornar erro específico
             if "invalid_grant" in str(e):
@@ -710,15 +1064,33 @@ async def gmail_preview(
                     detail="Credenciais do Gmail inválidas. Conecte sua conta Gmail novamente."
                 )
             raise e
-        previews = []
-        for m in messages:
-            full = gmail_service.get_message_full(m["id"])
-            if not full:
+        # Mensagens obtidas via batch HTTP com respostas parciais (metadados e
+        # partes de texto, sem anexos), fora do event loop
+        all_fields = await loop.run_in_executor(
+            None, gmail_service.get_messages_for_preview, [m["id"] for m in messages], include_attachments
+        )
+        emails = []
+        for fields in all_fields:
+            if not fields:
                 continue
-            fields = gmail_service.extract_email_fields(full)
             processed = text_processor.process(fields["text"]) if fields["text"] else ""
-            cls = classifier.predict(processed)
-            reply = response_generator.generate(cls["category"], processed)
+            emails.append((fields, processed))
+        
+        # Classificar todos os emails de uma vez (lotes no Gemini)
+        results = await classify_and_respond_batch([processed for _, processed in emails])
+        
+        previews = []
+        drafts = []
+        for (fields, processed), cls in zip(emails, results):
+            if create_drafts and cls["category"] == "Produtivo" and cls["response"] and fields["from"]:
+                drafts.append({
+                    "messageId": fields["id"],
+                    "threadId": fields["threadId"],
+                    "rfcMessageId": fields.get("rfcMessageId"),
+                    "to": fields["from"],
+                    "subject": fields["subject"],
+                    "body": cls["response"],
+                })
             previews.append({
                 "id": fields["id"],
                 "threadId": fields["threadId"],
@@ -729,9 +1101,22 @@ async def gmail_preview(
                 "confidence": cls["confidence"],
                 "method": cls["method"],
                 "model_info": cls["model_info"],
-                "suggested_response": reply,
+                "suggested_response": cls["response"],
+                **({"attachments": fields.get("attachments", [])} if include_attachments else {}),
             })
-        return {"items": previews, "count": len(previews)}
+        response = {"items": previews, "count": len(previews)}
+        if create_drafts:
+            response["drafts"] = await loop.run_in_executor(None, gmail_service.create_drafts_batch, drafts)
+        if incremental:
+            # Só avança o historyId depois que o preview foi montado com sucesso
+            current_user.gmail_history_id = history_id
+            current_user.gmail_last_sync = datetime.utcnow()
+            db.commit()
+            response["full_sync"] = full_sync
+            # Mais mensagens novas do que o limit: o historyId salvo só cobre as
+            # retornadas, e a próxima sincronização traz as seguintes
+            response["has_more"] = has_more
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -751,9 +1136,9 @@ async def gmail_send(
         if not current_user.gmail_connected or not current_user.gmail_credentials:
             raise HTTPException(status_code=400, detail="Gmail não conectado. Conecte sua conta Gmail primeiro.")
         
-        # Criar serviço Gmail com credenciais do usuário
-        gmail_service = GmailService(user_credentials=current_user.gmail_credentials)
-        if not gmail_service.ensure_authenticated():
+        # Serviço Gmail autenticado reaproveitado do pool (por usuário)
+        gmail_service = await get_user_gmail_service(current_user)
+        if gmail_service is None:
             raise HTTPException(status_code=400, detail="Falha na autenticação Gmail. Reconecte sua conta Gmail.")
 
         to_email = data.get("to")
@@ -763,7 +1148,10 @@ async def gmail_send(
         if not to_email or not body:
             raise HTTPException(status_code=400, detail="Campos obrigatórios: to, body")
 
-        ok = gmail_service.send_reply(to_email=to_email, subject=subject, body=body, thread_id=thread_id)
+        # Chamadas bloqueantes da API do Gmail fora do event loop
+        ok = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            gmail_service.send_reply, to_email=to_email, subject=subject, body=body, thread_id=thread_id
+        ))
         if ok:
             return {"status": "sent"}
         else:
@@ -776,6 +1164,48 @@ async def gmail_send(
             return {"auth_url": msg.replace("OAUTH_LINK::", "", 1)}
         raise HTTPException(status_code=500, detail=f"Erro no envio do Gmail: {msg}")
 
+@app.post("/gmail/drafts")
+async def gmail_create_drafts(
+    data: dict,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Cria rascunhos de resposta em lote, pulando conversas que já têm rascunho
+
+    Corpo:
+        items (List[Dict]): Itens com to, subject, body e, opcionalmente,
+            messageId e threadId (como retornados por /gmail/preview)
+    """
+    try:
+        # Verificar se o usuário tem Gmail conectado
+        if not current_user.gmail_connected or not current_user.gmail_credentials:
+            raise HTTPException(status_code=400, detail="Gmail não conectado. Conecte sua conta Gmail primeiro.")
+
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            raise HTTPException(status_code=400, detail="Campo obrigatório: items (lista)")
+        for item in items:
+            if not isinstance(item, dict) or not item.get("to") or not item.get("body"):
+                raise HTTPException(status_code=400, detail="Cada item precisa dos campos to e body")
+
+        # Serviço Gmail autenticado reaproveitado do pool (por usuário)
+        gmail_service = await get_user_gmail_service(current_user)
+        if gmail_service is None:
+            raise HTTPException(status_code=400, detail="Falha na autenticação Gmail. Reconecte sua conta Gmail.")
+
+        # Chamadas bloqueantes da API do Gmail fora do event loop
+        manifest = await asyncio.get_running_loop().run_in_executor(None, gmail_service.create_drafts_batch, items)
+        created = sum(1 for entry in manifest if entry["status"] == "created")
+        skipped = sum(1 for entry in manifest if entry["status"] == "skipped")
+        return {"drafts": manifest, "created": created, "skipped": skipped, "failed": len(manifest) - created - skipped}
+    except HTTPException:
+        raise
+    except Exception as e:
+        msg = str(e)
+        if msg.startswith("OAUTH_LINK::"):
+            return {"auth_url": msg.replace("OAUTH_LINK::", "", 1)}
+        raise HTTPException(status_code=500, detail=f"Erro ao criar rascunhos: {msg}")
+
 @app.post("/gmail/mark-read")
 async def gmail_mark_read(
     data: dict,
@@ -786,16 +1216,17 @@ async def gmail_mark_read(
         if not current_user.gmail_connected or not current_user.gmail_credentials:
             raise HTTPException(status_code=400, detail="Gmail não conectado. Conecte sua conta Gmail primeiro.")
         
-        # Criar serviço Gmail com credenciais do usuário
-        gmail_service = GmailService(user_credentials=current_user.gmail_credentials)
-        if not gmail_service.ensure_authenticated():
+        # Serviço Gmail autenticado reaproveitado do pool (por usuário)
+        gmail_service = await get_user_gmail_service(current_user)
+        if gmail_service is None:
             raise HTTPException(status_code=400, detail="Falha na autenticação Gmail. Reconecte sua conta Gmail.")
 
         message_id = data.get("messageId")
         if not message_id:
             raise HTTPException(status_code=400, detail="Campo obrigatório: messageId")
 
-        ok = gmail_service.mark_as_read(message_id)
+        # Chamada bloqueante da API do Gmail fora do event loop
+        ok = await asyncio.get_running_loop().run_in_executor(None, gmail_service.mark_as_read, message_id)
         if ok:
             return {"status": "marked_as_read"}
         else:
@@ -808,6 +1239,60 @@ async def gmail_mark_read(
             return {"auth_url": msg.replace("OAUTH_LINK::", "", 1)}
         raise HTTPException(status_code=500, detail=f"Erro ao marcar como lido: {msg}")
 
+@app.post("/gmail/bulk-modify")
+async def gmail_bulk_modify(
+    data: dict,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Operações em lote após a triagem (users.messages.batchModify)
+
+    Corpo:
+        messageIds (List[str]): Mensagens a marcar como lidas (com markRead)
+        markRead (bool): Remove o label UNREAD (padrão: true)
+        categories (Dict[str, str]): ID da mensagem -> categoria, aplica o label EmailCraft/<categoria>
+    """
+    try:
+        # Verificar se o usuário tem Gmail conectado
+        if not current_user.gmail_connected or not current_user.gmail_credentials:
+            raise HTTPException(status_code=400, detail="Gmail não conectado. Conecte sua conta Gmail primeiro.")
+
+        message_ids = data.get("messageIds") or []
+        categories = data.get("categories") or {}
+        mark_read = bool(data.get("markRead", True))
+        if not isinstance(message_ids, list) or not isinstance(categories, dict):
+            raise HTTPException(status_code=400, detail="messageIds deve ser uma lista e categories um objeto")
+        if not message_ids and not categories:
+            raise HTTPException(status_code=400, detail="Informe messageIds e/ou categories")
+
+        # Serviço Gmail autenticado reaproveitado do pool (por usuário)
+        gmail_service = await get_user_gmail_service(current_user)
+        if gmail_service is None:
+            raise HTTPException(status_code=400, detail="Falha na autenticação Gmail. Reconecte sua conta Gmail.")
+
+        def run_bulk():
+            result = {"modified": 0, "failed": [], "labels": {}}
+            if categories:
+                # Label e UNREAD na mesma chamada para as mensagens categorizadas
+                result = gmail_service.apply_category_labels(categories, mark_read=mark_read)
+            remaining = [message_id for message_id in message_ids if message_id not in categories]
+            if mark_read and remaining:
+                read_result = gmail_service.mark_as_read_bulk(remaining)
+                result["modified"] += read_result["modified"]
+                result["failed"].extend(read_result["failed"])
+            return result
+
+        # Chamadas bloqueantes da API do Gmail fora do event loop
+        result = await asyncio.get_running_loop().run_in_executor(None, run_bulk)
+        return {"status": "ok" if not result["failed"] else "partial", **result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        msg = str(e)
+        if msg.startswith("OAUTH_LINK::"):
+            return {"auth_url": msg.replace("OAUTH_LINK::", "", 1)}
+        raise HTTPException(status_code=500, detail=f"Erro na operação em lote: {msg}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
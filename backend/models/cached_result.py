@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+
+try:
+    from database import Base
+except ImportError:
+    from backend.database import Base
+
+class CachedResult(Base):
+    """
+    Resultado do pipeline de classificação armazenado pelo cache em banco
+    """
+    __tablename__ = "classification_cache"
+    __table_args__ = {'extend_existing': True}
+
+    key = Column(String(64), primary_key=True)  # sha256 do texto normalizado + versão
+    value = Column(JSON, nullable=False)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, index=True)
+    last_access = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<CachedResult(key='{self.key}', size_bytes={self.size_bytes})>"
@@ -1,22 +1,88 @@
 import logging
-from typing import Dict, Any
+import json
+import asyncio
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
 import os
 
+try:
+    from utils.keyword_matcher import KeywordMatcher
+    from utils.gemini_limiter import gemini_semaphore
+except ImportError:
+    from backend.utils.keyword_matcher import KeywordMatcher
+    from backend.utils.gemini_limiter import gemini_semaphore
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bloco de instruções compartilhado pelos prompts individual e em lote
+CLASSIFICATION_GUIDELINES = """DEFINIÇÕES CLARAS:
+- PRODUTIVO: Emails que REQUEREM AÇÃO ou RESPOSTA da empresa. Exemplos: solicitações, problemas técnicos, pedidos de orçamento, reclamações, suporte, atualizações de status, propostas comerciais
+- IMPRODUTIVO: Emails que NÃO REQUEREM AÇÃO da empresa. Exemplos: cumprimentos, agradecimentos, felicitações, saudações simples, mensagens de despedida, mensagens sociais
+
+EXEMPLOS ESPECÍFICOS:
+PRODUTIVO: "Preciso de ajuda com o sistema de pagamento", "Solicito orçamento para projeto", "Erro no sistema de cobrança", "Problema técnico no servidor", "Quero contratar seus serviços"
+IMPRODUTIVO: "Feliz Natal e próspero ano novo!", "Obrigado pelo atendimento", "Bom dia", "Parabéns pelo aniversário", "Até logo", "Boa tarde"
+
+REGRA IMPORTANTE: Se o email é apenas um cumprimento, agradecimento ou saudação SEM solicitar nada específico, é IMPRODUTIVO."""
+
+# Schema JSON esperado na classificação em lote
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "category": {"type": "STRING", "enum": ["PRODUTIVO", "IMPRODUTIVO"]},
+        },
+        "required": ["index", "category"],
+    },
+}
+
+@dataclass(frozen=True)
+class ClassificationResult:
+    """
+    Resultado imutável de uma classificação
+
+    Cada chamada de predict gera um objeto novo, então o classificador não guarda
+    estado por requisição e pode ser compartilhado entre threads e tarefas async.
+    Também aceita acesso por chave (result["category"]) por compatibilidade.
+    """
+    category: str
+    confidence: float
+    method: str
+    model_info: str
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
 class EmailClassifier:
     """
     Classificador de emails usando Gemini AI para categorizar em Produtivo/Improdutivo
     """
     
+    # Incrementar sempre que o prompt ou as regras de classificação mudarem
+    # (invalida resultados em cache)
+    PROMPT_VERSION = "classifier-v1"
+    
     def __init__(self, gemini_client=None):
         self.model_name = "distilbert-base-uncased"
         self.classifier = None
         self.tokenizer = None
-        self.last_confidence = 0.0
         self.gemini_client = gemini_client
+        self.batch_size = int(os.getenv("GEMINI_BATCH_SIZE", "10"))
+        # Modo "gemini" (padrão): Gemini sempre que disponível.
+        # Modo "cascade": camada barata primeiro, Gemini só abaixo do limiar de confiança.
+        self.mode = os.getenv("CLASSIFIER_MODE", "gemini").lower()
+        self.cascade_threshold = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "0.8"))
+        # Palavras-chave da categoria vencedora necessárias para a cascata confiar nelas
+        self.cascade_min_keyword_hits = max(1, int(os.getenv("CASCADE_MIN_KEYWORD_HITS", "3")))
+        self.local_model = None
+        self.online_learner = None
         self._load_model()
     
     def set_gemini_client(self, gemini_client):
@@ -32,6 +98,10 @@ class EmailClassifier:
         
         # Sempre carregar palavras-chave como fallback adicional
         self._load_keywords()
+        
+        # Modelo local (NumPy) opcional, usado antes das palavras-chave
+        self._load_local_model()
+        self._load_online_learner()
     
     def _load_keywords(self):
         """Carrega palavras-chave para fallback"""
@@ -46,8 +116,64 @@ class EmailClassifier:
             'agradecimento', 'cumprimento', 'saudação', 'olá', 'oi', 'tchau',
             'até logo', 'boa tarde', 'bom dia', 'boa noite', 'felicitações'
         ]
+        self.keyword_matcher = KeywordMatcher({
+            "productive": self.keywords_productive,
+            "unproductive": self.keywords_unproductive,
+        })
         logger.info("Palavras-chave carregadas para fallback!")
     
+    def _load_local_model(self):
+        """Carrega o modelo local treinado (LOCAL_MODEL_PATH), se existir e o NumPy estiver instalado"""
+        path = self.local_model_path = os.getenv(
+            "LOCAL_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_model.npz")
+        )
+        if not path or not os.path.exists(path):
+            logger.info("Modelo local não encontrado; camada barata usa palavras-chave")
+            return
+        try:
+            try:
+                from models.local_model import HashedLogisticModel
+            except ImportError:
+                from backend.models.local_model import HashedLogisticModel
+            self.local_model = HashedLogisticModel.load(path)
+            logger.info(f"Modelo local carregado de {path} (versão {self.local_model.version})")
+        except ImportError:
+            logger.warning("NumPy não instalado; modelo local desabilitado")
+        except Exception as e:
+            logger.error(f"Erro ao carregar modelo local: {e}")
+    
+    def _load_online_learner(self):
+        """Habilita o aprendizado online com os rótulos do Gemini (ONLINE_LEARNING_ENABLED)"""
+        try:
+            try:
+                from models.online_learner import build_online_learner
+            except ImportError:
+                from backend.models.online_learner import build_online_learner
+            self.online_learner = build_online_learner(self.local_model)
+        except Exception as e:
+            logger.error(f"Erro ao iniciar aprendizado online: {e}")
+    
+    def _record_gemini_label(self, text: str, category: str):
+        """Guarda o veredito do Gemini para o aprendizado online"""
+        if self.online_learner is not None:
+            try:
+                self.online_learner.record(text, category)
+            except Exception as e:
+                logger.error(f"Erro ao registrar rótulo do Gemini: {e}")
+    
+    def _try_online_tier(self, text: str) -> Optional[ClassificationResult]:
+        """Responde com o modelo aprendido online quando a concordância com o Gemini permite"""
+        if self.online_learner is None or not self.gemini_client:
+            return None
+        routed = self.online_learner.route_local(text)
+        if routed is None:
+            return None
+        category, confidence = routed
+        return ClassificationResult(
+            category, confidence, "local_model_online",
+            "Modelo local aprendido com o Gemini (aprendizado online)"
+        )
+    
     def _load_fallback_model(self):
         """Carrega modelo de fallback mais simples"""
         try:
@@ -58,6 +184,80 @@ class EmailClassifier:
             logger.error(f"Erro ao carregar modelo de fallback: {e}")
             raise
     
+    def _build_gemini_prompt(self, text: str) -> str:
+        """Monta o prompt de classificação de um único email"""
+        return f"""Você é um especialista em classificação de emails corporativos.
+
+{CLASSIFICATION_GUIDELINES}
+
+EMAIL PARA CLASSIFICAR: {text}
+
+Responda apenas: PRODUTIVO ou IMPRODUTIVO"""
+    
+    def _parse_gemini_label(self, raw_response: str) -> Optional[str]:
+        """Converte a resposta do Gemini em categoria (None se inesperada)"""
+        result = raw_response.strip().upper()
+        logger.info(f"Resposta bruta do Gemini: '{raw_response.strip()}' -> '{result}'")
+        
+        # Validar resposta
+        if result == "PRODUTIVO":
+            logger.info("Classificação: PRODUTIVO")
+            return "Produtivo"
+        elif result == "IMPRODUTIVO":
+            logger.info("Classificação: IMPRODUTIVO")
+            return "Improdutivo"
+        else:
+            logger.warning(f"Resposta inesperada do Gemini: '{result}'")
+            return None
+    
+    def _gemini_result(self, category: str, model_info: str = "Gemini AI - Classificação inteligente") -> ClassificationResult:
+        # Alta confiança para Gemini
+        return ClassificationResult(category, 0.9, "gemini", model_info)
+    
+    def _gemini_prediction(self, text: str) -> ClassificationResult:
+        """Classifica com o Gemini, caindo para palavras-chave em caso de erro ou resposta inválida"""
+        try:
+            if not self.gemini_client:
+                logger.warning("Cliente Gemini não configurado, usando fallback")
+                return self._fallback_result(text)
+            
+            # Fazer chamada para Gemini
+            response = self.gemini_client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=self._build_gemini_prompt(text)
+            )
+            category = self._parse_gemini_label(response.text)
+            if not category:
+                return self._fallback_result(text)
+            self._record_gemini_label(text, category)
+            return self._gemini_result(category)
+                
+        except Exception as e:
+            logger.error(f"Erro na classificação Gemini: {e}")
+            return self._fallback_result(text)
+    
+    async def _agemini_prediction(self, text: str) -> ClassificationResult:
+        """Versão assíncrona de _gemini_prediction, respeitando o limite de chamadas simultâneas"""
+        try:
+            if not self.gemini_client:
+                logger.warning("Cliente Gemini não configurado, usando fallback")
+                return self._fallback_result(text)
+            
+            async with gemini_semaphore():
+                response = await self.gemini_client.aio.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=self._build_gemini_prompt(text)
+                )
+            category = self._parse_gemini_label(response.text)
+            if not category:
+                return self._fallback_result(text)
+            self._record_gemini_label(text, category)
+            return self._gemini_result(category)
+                
+        except Exception as e:
+            logger.error(f"Erro na classificação Gemini: {e}")
+            return self._fallback_result(text)
+    
     def classify_with_gemini(self, text: str) -> str:
         """
         Classifica email usando Gemini AI com prompt específico
@@ -68,55 +268,108 @@ class EmailClassifier:
         Returns:
             str: "Produtivo" ou "Improdutivo"
         """
-        try:
-            if not self.gemini_client:
-                logger.warning("Cliente Gemini não configurado, usando fallback")
-                return self._predict_fallback(text)
+        return self._gemini_prediction(text).category
+    
+    async def aclassify_with_gemini(self, text: str) -> str:
+        """
+        Versão assíncrona de classify_with_gemini (cliente async do Gemini)
+        
+        Args:
+            text (str): Texto do email
             
-            # Prompt otimizado para classificação de emails
-            prompt = f"""Você é um especialista em classificação de emails corporativos.
-
-DEFINIÇÕES CLARAS:
-- PRODUTIVO: Emails que REQUEREM AÇÃO ou RESPOSTA da empresa. Exemplos: solicitações, problemas técnicos, pedidos de orçamento, reclamações, suporte, atualizações de status, propostas comerciais
-- IMPRODUTIVO: Emails que NÃO REQUEREM AÇÃO da empresa. Exemplos: cumprimentos, agradecimentos, felicitações, saudações simples, mensagens de despedida, mensagens sociais
-
-EXEMPLOS ESPECÍFICOS:
-PRODUTIVO: "Preciso de ajuda com o sistema de pagamento", "Solicito orçamento para projeto", "Erro no sistema de cobrança", "Problema técnico no servidor", "Quero contratar seus serviços"
-IMPRODUTIVO: "Feliz Natal e próspero ano novo!", "Obrigado pelo atendimento", "Bom dia", "Parabéns pelo aniversário", "Até logo", "Boa tarde"
-
-REGRA IMPORTANTE: Se o email é apenas um cumprimento, agradecimento ou saudação SEM solicitar nada específico, é IMPRODUTIVO.
+        Returns:
+            str: "Produtivo" ou "Improdutivo"
+        """
+        return (await self._agemini_prediction(text)).category
+    
+    def _empty_text_result(self) -> ClassificationResult:
+        return ClassificationResult(
+            "Improdutivo", 0.5, "empty_text", "Texto vazio - classificado como improdutivo"
+        )
+    
+    def _error_result(self, error: Exception) -> ClassificationResult:
+        logger.error(f"Erro na classificação: {error}")
+        return ClassificationResult(
+            "Improdutivo", 0.5, "error_fallback", f"Erro na classificação - {str(error)}"
+        )
+    
+    def _fallback_result(self, text: str) -> ClassificationResult:
+        if self.local_model is not None:
+            category, confidence = self.local_model.predict(text)
+            return ClassificationResult(
+                category, confidence, "local_model", "Modelo local (regressão logística com features hasheadas)"
+            )
+        # Fallback para palavras-chave (sem dependências pesadas)
+        category, confidence = self._keyword_prediction(text)
+        return ClassificationResult(
+            category, confidence, "keywords_fallback", "Classificação por palavras-chave (fallback)"
+        )
+    
+    def _cheap_tier_result(self, text: str) -> ClassificationResult:
+        """Classificação da camada barata da cascata (modelo local ou palavras-chave)"""
+        if self.local_model is not None:
+            category, confidence = self.local_model.predict(text)
+            return ClassificationResult(
+                category, confidence, "local_model_cascade",
+                "Modelo local (cascata, confiança acima do limiar)"
+            )
+        category, confidence = self._keyword_cascade_prediction(text)
+        return ClassificationResult(
+            category, confidence, "keywords_cascade",
+            "Classificação por palavras-chave (cascata, confiança acima do limiar)"
+        )
+    
+    def _keyword_cascade_prediction(self, text: str) -> Tuple[str, float]:
+        """
+        Palavras-chave na cascata, com confiança proporcional à evidência
 
-EMAIL PARA CLASSIFICAR: {text}
+        A confiança de _keyword_prediction só mede a margem entre as contagens:
+        uma única palavra ("olá") daria 1.0 e pularia o Gemini. Aqui a margem é
+        multiplicada pela fração de CASCADE_MIN_KEYWORD_HITS atingida pela
+        categoria vencedora, então só emails com várias palavras-chave
+        concordantes passam do limiar.
+        """
+        counts = self.keyword_matcher.count(text)
+        productive_count = counts["productive"]
+        unproductive_count = counts["unproductive"]
+        total_keywords = productive_count + unproductive_count
+        if total_keywords == 0:
+            return "Improdutivo", 0.0
+        category = "Produtivo" if productive_count > unproductive_count else "Improdutivo"
+        margin = abs(productive_count - unproductive_count) / total_keywords
+        evidence = min(1.0, max(productive_count, unproductive_count) / self.cascade_min_keyword_hits)
+        return category, margin * evidence
 
-Responda apenas: PRODUTIVO ou IMPRODUTIVO"""
+    def guess_category(self, text: str) -> str:
+        """
+        Palpite instantâneo de categoria (modelo local ou palavras-chave), sem limiar de confiança
 
-            # Fazer chamada para Gemini
-            response = self.gemini_client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
-            
-            result = response.text.strip().upper()
-            logger.info(f"Resposta bruta do Gemini: '{response.text.strip()}' -> '{result}'")
-            
-            # Validar resposta
-            if result == "PRODUTIVO":
-                self.last_confidence = 0.9  # Alta confiança para Gemini
-                logger.info("Classificação: PRODUTIVO")
-                return "Produtivo"
-            elif result == "IMPRODUTIVO":
-                self.last_confidence = 0.9  # Alta confiança para Gemini
-                logger.info("Classificação: IMPRODUTIVO")
-                return "Improdutivo"
-            else:
-                logger.warning(f"Resposta inesperada do Gemini: '{result}'")
-                return self._predict_fallback(text)
-                
-        except Exception as e:
-            logger.error(f"Erro na classificação Gemini: {e}")
-            return self._predict_fallback(text)
+        Sem modelo local, só palpita "Improdutivo" quando as palavras-chave
+        improdutivas predominam: textos sem palavras-chave são justamente os
+        produtivos "general", cuja resposta exige a segunda chamada ao Gemini
+        que a especulação adianta (errar para improdutivo custa só um template).
+        """
+        if not text or len(text.strip()) == 0:
+            return self._empty_text_result().category
+        if self.local_model is not None:
+            return self.local_model.predict(text[:1000])[0]
+        counts = self.keyword_matcher.count(text[:1000])
+        return "Improdutivo" if counts["unproductive"] > counts["productive"] else "Produtivo"
+    
+    def _try_cheap_tier(self, text: str) -> Optional[ClassificationResult]:
+        """
+        No modo cascata, retorna o resultado da camada barata quando a confiança
+        atinge o limiar (ou quando não há Gemini para escalar); senão None
+        """
+        if self.mode != "cascade":
+            return None
+        result = self._cheap_tier_result(text)
+        if result.confidence >= self.cascade_threshold or not self.gemini_client:
+            return result
+        logger.info(f"Cascata: confiança {result.confidence:.2f} abaixo do limiar, escalando para o Gemini")
+        return None
     
-    def predict(self, text: str) -> Dict[str, Any]:
+    def predict(self, text: str) -> ClassificationResult:
         """
         Classifica o texto do email
         
@@ -124,50 +377,204 @@ Responda apenas: PRODUTIVO ou IMPRODUTIVO"""
             text (str): Texto do email a ser classificado
             
         Returns:
-            Dict[str, Any]: Dicionário com categoria, confiança e método usado
+            ClassificationResult: Categoria, confiança, método usado e descrição do modelo
         """
         try:
             if not text or len(text.strip()) == 0:
-                return {
-                    "category": "Improdutivo",
-                    "confidence": 0.5,
-                    "method": "empty_text",
-                    "model_info": "Texto vazio - classificado como improdutivo"
-                }
+                return self._empty_text_result()
             
             # Limitar tamanho do texto
             text = text[:1000]  # Limite maior para Gemini
             
+            # Modo cascata: emails óbvios não chegam ao Gemini
+            cheap_result = self._try_cheap_tier(text) or self._try_online_tier(text)
+            if cheap_result:
+                return cheap_result
+            
             # Tentar Gemini primeiro (método principal)
             if self.gemini_client:
-                try:
-                    result = self.classify_with_gemini(text)
-                    return {
-                        "category": result,
-                        "confidence": self.last_confidence,
-                        "method": "gemini",
-                        "model_info": "Gemini AI - Classificação inteligente"
-                    }
-                except Exception as e:
-                    logger.warning(f"Gemini falhou, usando fallback: {e}")
-            
-            # Fallback para palavras-chave (sem dependências pesadas)
-            result = self._predict_fallback(text)
-            return {
-                "category": result,
-                "confidence": self.last_confidence,
-                "method": "keywords_fallback",
-                "model_info": "Classificação por palavras-chave (fallback)"
-            }
+                return self._gemini_prediction(text)
+            
+            return self._fallback_result(text)
+                
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def apredict(self, text: str) -> ClassificationResult:
+        """
+        Versão assíncrona de predict, sem bloquear o event loop durante a chamada ao Gemini
+        
+        Args:
+            text (str): Texto do email a ser classificado
+            
+        Returns:
+            ClassificationResult: Categoria, confiança, método usado e descrição do modelo
+        """
+        try:
+            if not text or len(text.strip()) == 0:
+                return self._empty_text_result()
+            
+            text = text[:1000]
+            
+            cheap_result = self._try_cheap_tier(text) or self._try_online_tier(text)
+            if cheap_result:
+                return cheap_result
+            
+            if self.gemini_client:
+                return await self._agemini_prediction(text)
+            
+            return self._fallback_result(text)
                 
         except Exception as e:
-            logger.error(f"Erro na classificação: {e}")
-            return {
-                "category": "Improdutivo",
-                "confidence": 0.5,
-                "method": "error_fallback",
-                "model_info": f"Erro na classificação - {str(e)}"
-            }
+            return self._error_result(e)
+    
+    def _build_batch_prompt(self, texts: List[str]) -> str:
+        """Monta o prompt de classificação em lote (instruções enviadas uma única vez)"""
+        emails_block = "\n\n".join(
+            f"EMAIL {index}:\n{text}" for index, text in enumerate(texts)
+        )
+        return f"""Você é um especialista em classificação de emails corporativos.
+
+{CLASSIFICATION_GUIDELINES}
+
+Classifique cada um dos {len(texts)} emails abaixo, identificados pelo índice.
+
+{emails_block}
+
+Responda com um array JSON contendo, para cada email, um objeto {{"index": <índice>, "category": "PRODUTIVO" ou "IMPRODUTIVO"}}."""
+    
+    def _parse_batch_response(self, raw_response: str, size: int) -> List[Any]:
+        """Mapeia o array JSON do Gemini de volta para as posições do lote"""
+        results = [None] * size
+        items = json.loads(raw_response)
+        for item in items if isinstance(items, list) else []:
+            try:
+                index = int(item.get("index"))
+                category = str(item.get("category", "")).strip().upper()
+            except (AttributeError, TypeError, ValueError):
+                continue
+            if not 0 <= index < size:
+                continue
+            if category == "PRODUTIVO":
+                results[index] = "Produtivo"
+            elif category == "IMPRODUTIVO":
+                results[index] = "Improdutivo"
+        
+        logger.info(f"Lote classificado pelo Gemini: {sum(r is not None for r in results)}/{size} itens válidos")
+        return results
+    
+    def classify_batch_with_gemini(self, texts: List[str]) -> List[Any]:
+        """
+        Classifica vários emails em uma única chamada ao Gemini
+        
+        As instruções são enviadas uma vez só e a resposta é um array JSON
+        indexado pela posição de cada email no lote.
+        
+        Args:
+            texts (List[str]): Textos dos emails
+            
+        Returns:
+            List[Optional[str]]: "Produtivo"/"Improdutivo" por posição, ou None
+            para os itens que não puderam ser interpretados
+        """
+        if not self.gemini_client or not texts:
+            return [None] * len(texts)
+        
+        try:
+            response = self.gemini_client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=self._build_batch_prompt(texts),
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": BATCH_RESPONSE_SCHEMA,
+                }
+            )
+            return self._parse_batch_response(response.text, len(texts))
+        except Exception as e:
+            logger.error(f"Erro na classificação em lote com Gemini: {e}")
+            return [None] * len(texts)
+    
+    async def aclassify_batch_with_gemini(self, texts: List[str]) -> List[Any]:
+        """Versão assíncrona de classify_batch_with_gemini"""
+        if not self.gemini_client or not texts:
+            return [None] * len(texts)
+        
+        try:
+            async with gemini_semaphore():
+                response = await self.gemini_client.aio.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=self._build_batch_prompt(texts),
+                    config={
+                        "response_mime_type": "application/json",
+                        "response_schema": BATCH_RESPONSE_SCHEMA,
+                    }
+                )
+            return self._parse_batch_response(response.text, len(texts))
+        except Exception as e:
+            logger.error(f"Erro na classificação em lote com Gemini: {e}")
+            return [None] * len(texts)
+    
+    def _split_batch(self, texts: List[str]):
+        """Resolve itens vazios e os aceitos pela cascata; divide os demais em lotes de até batch_size"""
+        results = [None] * len(texts)
+        pending = []
+        for index, text in enumerate(texts):
+            if not text or len(text.strip()) == 0:
+                results[index] = self._empty_text_result()
+                continue
+            text = text[:1000]
+            cheap_result = self._try_cheap_tier(text) or self._try_online_tier(text)
+            if cheap_result:
+                results[index] = cheap_result
+            else:
+                pending.append((index, text))
+        size = max(1, self.batch_size)
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+        return results, pending, chunks
+    
+    def _merge_batch(self, results: List[Any], pending, chunks, categories_per_chunk) -> List[ClassificationResult]:
+        """Aplica as categorias do Gemini e o fallback individual aos itens restantes"""
+        for chunk, categories in zip(chunks, categories_per_chunk):
+            for (index, text), category in zip(chunk, categories):
+                if category is not None:
+                    self._record_gemini_label(text, category)
+                    results[index] = self._gemini_result(category, "Gemini AI - Classificação inteligente (lote)")
+        
+        for index, text in pending:
+            if results[index] is None:
+                results[index] = self._fallback_result(text)
+        return results
+    
+    def predict_batch(self, texts: List[str]) -> List[ClassificationResult]:
+        """
+        Classifica vários emails, agrupando as chamadas ao Gemini em lotes
+        
+        Itens vazios não vão para o Gemini e itens que o Gemini não classificou
+        de forma válida caem individualmente no fallback por palavras-chave.
+        
+        Args:
+            texts (List[str]): Textos dos emails a serem classificados
+            
+        Returns:
+            List[ClassificationResult]: Um resultado por texto, no mesmo formato de predict()
+        """
+        results, pending, chunks = self._split_batch(texts)
+        categories_per_chunk = []
+        if self.gemini_client:
+            categories_per_chunk = [
+                self.classify_batch_with_gemini([text for _, text in chunk]) for chunk in chunks
+            ]
+        return self._merge_batch(results, pending, chunks, categories_per_chunk)
+    
+    async def apredict_batch(self, texts: List[str]) -> List[ClassificationResult]:
+        """Versão assíncrona de predict_batch; os lotes são enviados ao Gemini em paralelo"""
+        results, pending, chunks = self._split_batch(texts)
+        categories_per_chunk = []
+        if self.gemini_client:
+            categories_per_chunk = await asyncio.gather(*[
+                self.aclassify_batch_with_gemini([text for _, text in chunk]) for chunk in chunks
+            ])
+        return self._merge_batch(results, pending, chunks, categories_per_chunk)
     
     def _predict_bert(self, text: str) -> str:
         """Removido em ambiente serverless; mantido por compatibilidade."""
@@ -176,38 +583,32 @@ Responda apenas: PRODUTIVO ou IMPRODUTIVO"""
     
     def _predict_fallback(self, text: str) -> str:
         """Classificação usando palavras-chave (fallback)"""
+        return self._keyword_prediction(text)[0]
+    
+    def _keyword_prediction(self, text: str) -> Tuple[str, float]:
+        """Classificação por palavras-chave, retornando (categoria, confiança)"""
         try:
-            text_lower = text.lower()
-            
-            # Contar palavras-chave produtivas
-            productive_count = sum(1 for word in self.keywords_productive if word in text_lower)
-            
-            # Contar palavras-chave improdutivas
-            unproductive_count = sum(1 for word in self.keywords_unproductive if word in text_lower)
+            # Contar palavras-chave produtivas e improdutivas em uma única passada
+            counts = self.keyword_matcher.count(text)
+            productive_count = counts["productive"]
+            unproductive_count = counts["unproductive"]
             
             # Calcular confiança baseada na diferença
             total_keywords = productive_count + unproductive_count
             if total_keywords == 0:
-                self.last_confidence = 0.5
-                return "Improdutivo"  # Default para textos neutros
+                return "Improdutivo", 0.5  # Default para textos neutros
             
             confidence = abs(productive_count - unproductive_count) / total_keywords
-            self.last_confidence = confidence
             
             # Decidir baseado na contagem
             if productive_count > unproductive_count:
-                return "Produtivo"
+                return "Produtivo", confidence
             else:
-                return "Improdutivo"
+                return "Improdutivo", confidence
                 
         except Exception as e:
             logger.error(f"Erro na classificação fallback: {e}")
-            self.last_confidence = 0.5
-            return "Improdutivo"
-    
-    def get_confidence(self) -> float:
-        """Retorna a confiança da última classificação"""
-        return self.last_confidence
+            return "Improdutivo", 0.5
     
     def get_model_info(self) -> Dict[str, Any]:
         """Retorna informações sobre o modelo"""
@@ -215,5 +616,7 @@ Responda apenas: PRODUTIVO ou IMPRODUTIVO"""
             "model_name": self.model_name,
             "gemini_available": self.gemini_client is not None,
             "fallback_mode": hasattr(self, 'fallback_model') and self.fallback_model,
-            "last_confidence": self.last_confidence
+            "mode": self.mode,
+            "local_model": self.local_model.version if self.local_model is not None else None,
+            "online_learning": self.online_learner.stats() if self.online_learner is not None else None
         }
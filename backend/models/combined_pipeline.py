@@ -0,0 +1,232 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from models.classifier import CLASSIFICATION_GUIDELINES, ClassificationResult
+    from utils.gemini_limiter import gemini_semaphore
+except ImportError:
+    from backend.models.classifier import CLASSIFICATION_GUIDELINES, ClassificationResult
+    from backend.utils.gemini_limiter import gemini_semaphore
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Schema JSON da resposta combinada (classificação + resposta sugerida)
+COMBINED_ITEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "category": {"type": "STRING", "enum": ["PRODUTIVO", "IMPRODUTIVO"]},
+        "confidence": {"type": "NUMBER"},
+        "reply": {"type": "STRING"},
+    },
+    "required": ["category", "confidence", "reply"],
+}
+
+COMBINED_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"index": {"type": "INTEGER"}, **COMBINED_ITEM_SCHEMA["properties"]},
+        "required": ["index", "category", "confidence", "reply"],
+    },
+}
+
+REPLY_GUIDELINES = """RESPOSTA SUGERIDA:
+Você é um assistente de atendimento ao cliente de uma empresa financeira.
+Se o email for PRODUTIVO, escreva uma resposta profissional, concisa e útil em português brasileiro (máximo 2 frases).
+Se for IMPRODUTIVO, deixe o campo reply vazio."""
+
+
+class CombinedPipeline:
+    """
+    Classificação e resposta sugerida em uma única chamada estruturada ao Gemini
+
+    No caminho mais comum (email produtivo de tipo "general") o pipeline separado
+    faz duas chamadas em sequência: classificar e depois gerar a resposta. Aqui as
+    duas saem de um único prompt com resposta JSON. Emails que não precisam de
+    resposta da IA (tipos com resposta pronta, camada barata da cascata) seguem o
+    caminho normal, que não faz a segunda chamada.
+    """
+
+    mode = "combined"
+
+    def __init__(self, classifier, response_generator):
+        self.classifier = classifier
+        self.response_generator = response_generator
+
+    def _build_prompt(self, text: str) -> str:
+        return f"""Você é um especialista em classificação de emails corporativos.
+
+{CLASSIFICATION_GUIDELINES}
+
+{REPLY_GUIDELINES}
+
+EMAIL: {text[:1000]}
+
+Responda com um objeto JSON {{"category": "PRODUTIVO" ou "IMPRODUTIVO", "confidence": <0 a 1>, "reply": <resposta sugerida>}}."""
+
+    def _build_batch_prompt(self, texts: List[str]) -> str:
+        emails_block = "\n\n".join(f"EMAIL {index}:\n{text[:1000]}" for index, text in enumerate(texts))
+        return f"""Você é um especialista em classificação de emails corporativos.
+
+{CLASSIFICATION_GUIDELINES}
+
+{REPLY_GUIDELINES}
+
+Classifique e responda cada um dos {len(texts)} emails abaixo, identificados pelo índice.
+
+{emails_block}
+
+Responda com um array JSON contendo, para cada email, um objeto {{"index": <índice>, "category": "PRODUTIVO" ou "IMPRODUTIVO", "confidence": <0 a 1>, "reply": <resposta sugerida>}}."""
+
+    @staticmethod
+    def _parse_item(item: Any) -> Optional[Tuple[str, float, str]]:
+        """Valida um objeto da resposta; retorna (categoria, confiança, resposta) ou None"""
+        if not isinstance(item, dict):
+            return None
+        category = {"PRODUTIVO": "Produtivo", "IMPRODUTIVO": "Improdutivo"}.get(
+            str(item.get("category", "")).strip().upper()
+        )
+        if category is None:
+            return None
+        try:
+            confidence = min(1.0, max(0.0, float(item.get("confidence", 0.9))))
+        except (TypeError, ValueError):
+            confidence = 0.9
+        return category, confidence, str(item.get("reply") or "").strip()
+
+    def _needs_combined_call(self, text: str) -> bool:
+        """Só vale combinar quando a resposta também viria do Gemini (produtivo 'general')"""
+        return (
+            self.classifier.gemini_client is not None
+            and self.response_generator._detect_request_type(text) == "general"
+        )
+
+    def _try_local_tiers(self, text: str) -> Optional[ClassificationResult]:
+        """Itens vazios e os resolvidos pela cascata/aprendizado online não vão ao Gemini"""
+        if not text or len(text.strip()) == 0:
+            return self.classifier._empty_text_result()
+        return self.classifier._try_cheap_tier(text) or self.classifier._try_online_tier(text)
+
+    async def _separate(self, text: str,
+                        classification: Optional[ClassificationResult] = None) -> Tuple[ClassificationResult, str]:
+        """Pipeline normal: classificação (se ainda não houver) e depois a resposta"""
+        classification = classification or await self.classifier.apredict(text)
+        return classification, await self.response_generator.agenerate(classification.category, text)
+
+    async def _finish(self, text: str, parsed: Optional[Tuple[str, float, str]],
+                      model_info: str) -> Tuple[ClassificationResult, str]:
+        """Monta o resultado a partir da resposta combinada, caindo para o pipeline separado se inválida"""
+        if parsed is None:
+            return await self._separate(text)
+
+        category, confidence, reply = parsed
+        self.classifier._record_gemini_label(text, category)
+        classification = ClassificationResult(category, confidence, "gemini_combined", model_info)
+        if category == "Produtivo" and reply:
+            return classification, reply
+        # Improdutivo (ou resposta vazia): templates, sem nova chamada para improdutivos
+        return classification, await self.response_generator.agenerate(category, text)
+
+    async def _acall(self, prompt: str, schema: Dict[str, Any]) -> Optional[str]:
+        try:
+            async with gemini_semaphore():
+                response = await self.classifier.gemini_client.aio.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=prompt,
+                    config={"response_mime_type": "application/json", "response_schema": schema},
+                )
+            return response.text
+        except Exception as e:
+            logger.error(f"Erro na chamada combinada ao Gemini: {e}")
+            return None
+
+    async def arun(self, text: str) -> Tuple[ClassificationResult, str]:
+        """
+        Classifica e gera a resposta de um email
+
+        Args:
+            text (str): Texto normalizado do email
+
+        Returns:
+            Tuple[ClassificationResult, str]: Classificação e resposta sugerida
+        """
+        local_result = self._try_local_tiers(text)
+        if local_result is not None or not self._needs_combined_call(text):
+            return await self._separate(text, local_result)
+
+        parsed = None
+        raw = await self._acall(self._build_prompt(text), COMBINED_ITEM_SCHEMA)
+        if raw is not None:
+            try:
+                parsed = self._parse_item(json.loads(raw))
+            except ValueError:
+                logger.warning("Resposta combinada do Gemini não é JSON válido")
+        return await self._finish(text, parsed, "Gemini AI - Classificação e resposta em uma chamada")
+
+    async def arun_batch(self, texts: List[str]) -> List[Tuple[ClassificationResult, str]]:
+        """
+        Versão em lote de arun: os emails que precisam do Gemini são enviados em
+        lotes de até classifier.batch_size, uma chamada combinada por lote
+        """
+        local_results = [self._try_local_tiers(text) for text in texts]
+        pending = [
+            index for index, text in enumerate(texts)
+            if local_results[index] is None and self._needs_combined_call(text)
+        ]
+        pending_set = set(pending)
+        # Itens que só precisam de classificação usam o lote normal do classificador
+        classify_only = [
+            index for index in range(len(texts)) if index not in pending_set and local_results[index] is None
+        ]
+        size = max(1, self.classifier.batch_size)
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+        raws, classifications = await asyncio.gather(
+            asyncio.gather(*[
+                self._acall(self._build_batch_prompt([texts[index] for index in chunk]), COMBINED_BATCH_SCHEMA)
+                for chunk in chunks
+            ]),
+            self.classifier.apredict_batch([texts[index] for index in classify_only]),
+        )
+        for index, classification in zip(classify_only, classifications):
+            local_results[index] = classification
+
+        parsed_by_index: Dict[int, Tuple[str, float, str]] = {}
+        for chunk, raw in zip(chunks, raws):
+            try:
+                items = json.loads(raw) if raw is not None else []
+            except ValueError:
+                logger.warning("Resposta combinada em lote do Gemini não é JSON válido")
+                items = []
+            for item in items if isinstance(items, list) else []:
+                try:
+                    position = int(item.get("index"))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+                parsed = self._parse_item(item)
+                if parsed is not None and 0 <= position < len(chunk):
+                    parsed_by_index[chunk[position]] = parsed
+
+        async def finish(index: int, text: str):
+            if index in pending_set:
+                return await self._finish(text, parsed_by_index.get(index),
+                                          "Gemini AI - Classificação e resposta em uma chamada (lote)")
+            # Fora do lote combinado: a classificação já está pronta, falta a resposta
+            return await self._separate(text, local_results[index])
+
+        return list(await asyncio.gather(*[finish(index, text) for index, text in enumerate(texts)]))
+
+
+def build_combined_pipeline(classifier, response_generator) -> Optional[CombinedPipeline]:
+    """
+    Cria o pipeline combinado quando PIPELINE_MODE=combined
+
+    PIPELINE_MODE: separate (padrão; classificação e resposta em chamadas separadas) ou combined
+    """
+    if os.getenv("PIPELINE_MODE", "separate").lower() != "combined":
+        return None
+    return CombinedPipeline(classifier, response_generator)
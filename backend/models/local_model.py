@@ -0,0 +1,147 @@
+import io
+import zlib
+import hashlib
+import logging
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class HashedLogisticModel:
+    """
+    Classificador local Produtivo/Improdutivo: feature hashing + regressão logística em NumPy
+
+    As features são unigramas e bigramas do texto normalizado pelo TextProcessor,
+    mapeados por crc32 (estável entre processos) para n_features posições com
+    sinal. A predição é um produto escalar esparso e leva microssegundos.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, weights: np.ndarray = None, bias: float = 0.0):
+        self.n_features = n_features
+        self.weights = weights if weights is not None else np.zeros(n_features, dtype=np.float32)
+        self.bias = float(bias)
+        self.version = "untrained"
+
+    def featurize(self, processed_text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Converte o texto normalizado em features hasheadas
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (índices, valores) normalizados em L2
+        """
+        tokens = processed_text.split()
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        indices = (hashes % self.n_features).astype(np.int64)
+        # O bit mais alto define o sinal, reduzindo o viés das colisões
+        values = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        values /= np.sqrt(len(features))
+        return indices, values
+
+    @staticmethod
+    def _sigmoid(scores: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-np.clip(scores, -30.0, 30.0)))
+
+    def predict_proba(self, processed_text: str) -> float:
+        """Probabilidade de o email ser Produtivo"""
+        indices, values = self.featurize(processed_text)
+        score = float(np.dot(self.weights[indices], values)) + self.bias
+        return float(self._sigmoid(np.array(score)))
+
+    def predict(self, processed_text: str) -> Tuple[str, float]:
+        """Retorna (categoria, confiança) para o texto normalizado"""
+        probability = self.predict_proba(processed_text)
+        if probability >= 0.5:
+            return "Produtivo", probability
+        return "Improdutivo", 1.0 - probability
+
+    def _batch_features(self, texts: Sequence[str]):
+        """Concatena as features de vários textos (formato CSR: índices, valores, comprimentos)"""
+        all_indices, all_values, lengths = [], [], []
+        for text in texts:
+            indices, values = self.featurize(text)
+            all_indices.append(indices)
+            all_values.append(values)
+            lengths.append(len(indices))
+        return np.concatenate(all_indices), np.concatenate(all_values), np.array(lengths)
+
+    def partial_fit(self, texts: Sequence[str], labels: Sequence[int],
+                    learning_rate: float = 0.5, l2: float = 1e-6) -> float:
+        """
+        Um passo de SGD sobre um mini-batch
+
+        Args:
+            texts (Sequence[str]): Textos normalizados
+            labels (Sequence[int]): 1 para Produtivo, 0 para Improdutivo
+            learning_rate (float): Taxa de aprendizado
+            l2 (float): Regularização L2
+
+        Returns:
+            float: Log-loss médio do mini-batch antes da atualização
+        """
+        if not texts:
+            return 0.0
+        indices, values, lengths = self._batch_features(texts)
+        y = np.asarray(labels, dtype=np.float32)
+        sample_ids = np.repeat(np.arange(len(texts)), lengths)
+
+        scores = np.bincount(sample_ids, weights=self.weights[indices] * values, minlength=len(texts)) + self.bias
+        probabilities = self._sigmoid(scores)
+        errors = probabilities - y
+
+        gradient = np.zeros(self.n_features, dtype=np.float64)
+        np.add.at(gradient, indices, errors[sample_ids] * values)
+        touched = np.unique(indices)
+        # Regularização aplicada só nas features do batch (SGD esparso)
+        self.weights[touched] -= (learning_rate * (gradient[touched] / len(texts) + l2 * self.weights[touched])).astype(np.float32)
+        self.bias -= learning_rate * float(errors.mean())
+
+        eps = 1e-7
+        return float(-np.mean(y * np.log(probabilities + eps) + (1 - y) * np.log(1 - probabilities + eps)))
+
+    def fit(self, texts: List[str], labels: List[int], epochs: int = 10, batch_size: int = 32,
+            learning_rate: float = 0.5, l2: float = 1e-6, seed: int = 42) -> "HashedLogisticModel":
+        """Treina o modelo com mini-batch SGD por algumas épocas"""
+        rng = np.random.default_rng(seed)
+        order = np.arange(len(texts))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            losses = []
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                losses.append(self.partial_fit([texts[i] for i in batch], [labels[i] for i in batch], learning_rate, l2))
+            logger.info(f"Época {epoch + 1}/{epochs} - log-loss médio: {np.mean(losses):.4f}")
+        return self
+
+    def save(self, path: str):
+        """Salva apenas os pesos não nulos (arquivo pequeno, .npz comprimido)"""
+        nonzero = np.flatnonzero(self.weights)
+        # Gravar via handle evita que o NumPy acrescente ".npz" ao caminho
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                n_features=np.int64(self.n_features),
+                indices=nonzero.astype(np.int32),
+                values=self.weights[nonzero].astype(np.float32),
+                bias=np.float64(self.bias),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "HashedLogisticModel":
+        """Carrega um modelo salvo com save()"""
+        with open(path, "rb") as f:
+            raw = f.read()
+        with np.load(io.BytesIO(raw)) as data:
+            n_features = int(data["n_features"])
+            weights = np.zeros(n_features, dtype=np.float32)
+            weights[data["indices"]] = data["values"]
+            model = cls(n_features=n_features, weights=weights, bias=float(data["bias"]))
+        # A versão entra na chave do cache de resultados
+        model.version = hashlib.sha256(raw).hexdigest()[:12]
+        return model
@@ -0,0 +1,231 @@
+import os
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LABEL_VALUES = {"Produtivo": 1, "Improdutivo": 0}
+
+
+class OnlineLearner:
+    """
+    Aprendizado contínuo de um modelo local (cópia do treinado offline) a partir dos rótulos do Gemini
+
+    Cada veredito do Gemini vira um par (texto normalizado, rótulo) num buffer
+    limitado; uma tarefa em segundo plano aplica mini-batches de SGD ao modelo
+    local e salva os pesos periodicamente. Antes de treinar com um exemplo, a
+    predição do modelo local é comparada ao rótulo (avaliação prequencial), e a
+    concordância numa janela deslizante decide a fração do tráfego que passa a
+    ser respondida só pelo modelo local. Uma parcela sempre continua indo ao
+    Gemini, para que a concordância siga sendo medida.
+    """
+
+    def __init__(self, model, path: Optional[str] = None, batch_size: int = 32, interval: float = 30.0,
+                 learning_rate: float = 0.5, window: int = 500, min_samples: int = 200,
+                 min_agreement: float = 0.9, max_local_share: float = 0.8, min_confidence: float = 0.7,
+                 max_pending: int = 5000):
+        self.model = model
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.learning_rate = learning_rate
+        self.min_samples = min_samples
+        self.min_agreement = min_agreement
+        self.max_local_share = max_local_share
+        self.min_confidence = min_confidence
+
+        self._pending = deque(maxlen=max_pending)
+        self._agreement = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._task = None
+        # Versão dos pesos de partida; cada mini-batch aplicado gera uma nova versão
+        self._base_version = getattr(model, "version", "online")
+        self.trained_samples = 0
+        self.routed_local = 0
+        self.routed_gemini = 0
+
+    def record(self, processed_text: str, gemini_label: str):
+        """Registra um veredito do Gemini e mede a concordância do modelo local"""
+        label = LABEL_VALUES.get(gemini_label)
+        if label is None or not processed_text:
+            return
+        with self._lock:
+            local_label, _ = self.model.predict(processed_text)
+            self._agreement.append(local_label == gemini_label)
+            self._pending.append((processed_text, label))
+
+    def agreement(self) -> float:
+        """Concordância do modelo local com o Gemini na janela recente"""
+        with self._lock:
+            return sum(self._agreement) / len(self._agreement) if self._agreement else 0.0
+
+    def local_share(self) -> float:
+        """
+        Fração do tráfego a ser respondida pelo modelo local
+
+        Zero até haver min_samples medidos e concordância acima de min_agreement;
+        depois cresce linearmente com a concordância até max_local_share.
+        """
+        with self._lock:
+            measured = len(self._agreement)
+            agreement = sum(self._agreement) / measured if measured else 0.0
+        if measured < min(self.min_samples, self._agreement.maxlen) or agreement < self.min_agreement:
+            return 0.0
+        if self.min_agreement >= 1.0:
+            return self.max_local_share
+        return self.max_local_share * min(1.0, (agreement - self.min_agreement) / (1.0 - self.min_agreement))
+
+    def route_local(self, processed_text: str):
+        """
+        Decide se o email será respondido pelo modelo local
+
+        Returns:
+            Optional[Tuple[str, float]]: (categoria, confiança) do modelo local, ou None para seguir ao Gemini
+        """
+        share = self.local_share()
+        with self._lock:
+            if share > 0 and random.random() < share:
+                category, confidence = self.model.predict(processed_text)
+                if confidence >= self.min_confidence:
+                    self.routed_local += 1
+                    return category, confidence
+            self.routed_gemini += 1
+        return None
+
+    def train_pending(self) -> int:
+        """Aplica mini-batches de SGD com os exemplos acumulados; retorna quantos foram usados"""
+        trained = 0
+        while True:
+            with self._lock:
+                if len(self._pending) < self.batch_size:
+                    break
+                batch = [self._pending.popleft() for _ in range(self.batch_size)]
+            texts = [text for text, _ in batch]
+            labels = [label for _, label in batch]
+            with self._lock:
+                self.model.partial_fit(texts, labels, learning_rate=self.learning_rate)
+                self.trained_samples += len(batch)
+                # Nova versão a cada mini-batch: a versão entra na chave do cache de resultados
+                self.model.version = f"{self._base_version}+{self.trained_samples}"
+            trained += len(batch)
+        if trained:
+            logger.info(f"Aprendizado online: {trained} exemplos aplicados, concordância {self.agreement():.3f}")
+        return trained
+
+    def save(self):
+        """Salva os pesos atualizados de forma atômica"""
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with self._lock:
+                self.model.save(tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Erro ao salvar pesos do aprendizado online: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await loop.run_in_executor(None, self.train_pending):
+                    await loop.run_in_executor(None, self.save)
+            except Exception as e:
+                logger.error(f"Erro no aprendizado online: {e}")
+
+    def start(self):
+        """Inicia a tarefa de treino em segundo plano (requer event loop em execução)"""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Aprendizado online iniciado")
+        except RuntimeError:
+            logger.debug("Sem event loop em execução; aprendizado online não iniciado")
+
+    def stop(self):
+        """Cancela a tarefa de treino e salva o que já foi aprendido"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.train_pending()
+        self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores do aprendizado online"""
+        local_share = self.local_share()
+        with self._lock:
+            return {
+                "agreement": sum(self._agreement) / len(self._agreement) if self._agreement else 0.0,
+                "measured": len(self._agreement),
+                "local_share": local_share,
+                "pending": len(self._pending),
+                "trained_samples": self.trained_samples,
+                "routed_local": self.routed_local,
+                "routed_gemini": self.routed_gemini,
+                "model_version": self.model.version,
+            }
+
+
+def build_online_learner(base_model=None, path: Optional[str] = None) -> Optional[OnlineLearner]:
+    """
+    Cria o aprendizado online a partir das variáveis de ambiente
+
+    Os pesos aprendidos ficam em um arquivo próprio (ONLINE_LEARNING_PATH),
+    separado do modelo local: o modelo treinado offline continua sendo a
+    camada barata/fallback, e os pesos aprendidos só com rótulos do Gemini
+    respondem apenas pelo roteamento controlado pela concordância.
+
+    ONLINE_LEARNING_ENABLED: habilita o modo (padrão: false)
+    ONLINE_LEARNING_PATH: arquivo dos pesos aprendidos (padrão: models/local_model_online.npz)
+    ONLINE_LEARNING_BATCH_SIZE / ONLINE_LEARNING_INTERVAL / ONLINE_LEARNING_RATE: treino em segundo plano
+    ONLINE_LEARNING_WINDOW / ONLINE_LEARNING_MIN_SAMPLES / ONLINE_LEARNING_MIN_AGREEMENT: medição de concordância
+    ONLINE_LEARNING_MAX_LOCAL_SHARE / ONLINE_LEARNING_MIN_CONFIDENCE: roteamento para o modelo local
+    """
+    if os.getenv("ONLINE_LEARNING_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        try:
+            from models.local_model import HashedLogisticModel
+        except ImportError:
+            from backend.models.local_model import HashedLogisticModel
+    except ImportError:
+        logger.warning("NumPy não instalado; aprendizado online desabilitado")
+        return None
+    path = path or os.getenv("ONLINE_LEARNING_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "local_model_online.npz"
+    )
+    model = None
+    if os.path.exists(path):
+        try:
+            model = HashedLogisticModel.load(path)
+            logger.info(f"Pesos do aprendizado online carregados de {path} (versão {model.version})")
+        except Exception as e:
+            logger.error(f"Erro ao carregar pesos do aprendizado online: {e}")
+    if model is None and base_model is not None:
+        # Parte de uma cópia do modelo local, que não é alterado pelo treino online
+        model = HashedLogisticModel(base_model.n_features, base_model.weights.copy(), base_model.bias)
+        model.version = f"{base_model.version}-online"
+    if model is None:
+        # Sem pesos treinados, começa do zero e aprende só com o Gemini
+        model = HashedLogisticModel()
+        model.version = "online"
+    return OnlineLearner(
+        model,
+        path=path,
+        batch_size=int(os.getenv("ONLINE_LEARNING_BATCH_SIZE", "32")),
+        interval=float(os.getenv("ONLINE_LEARNING_INTERVAL", "30")),
+        learning_rate=float(os.getenv("ONLINE_LEARNING_RATE", "0.5")),
+        window=int(os.getenv("ONLINE_LEARNING_WINDOW", "500")),
+        min_samples=int(os.getenv("ONLINE_LEARNING_MIN_SAMPLES", "200")),
+        min_agreement=float(os.getenv("ONLINE_LEARNING_MIN_AGREEMENT", "0.9")),
+        max_local_share=float(os.getenv("ONLINE_LEARNING_MAX_LOCAL_SHARE", "0.8")),
+        min_confidence=float(os.getenv("ONLINE_LEARNING_MIN_CONFIDENCE", "0.7")),
+    )
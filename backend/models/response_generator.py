@@ -1,19 +1,40 @@
 import os
+import asyncio
+import inspect
 import logging
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import re
 
+try:
+    from utils.keyword_matcher import KeywordMatcher
+    from utils.gemini_limiter import gemini_semaphore
+except ImportError:
+    from backend.utils.keyword_matcher import KeywordMatcher
+    from backend.utils.gemini_limiter import gemini_semaphore
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Marca de fim do stream na fila entre a leitura do Gemini e o cliente
+_STREAM_END = object()
+
+
+class StreamInterruptedError(RuntimeError):
+    """O Gemini falhou depois de já ter produzido parte da resposta"""
+
+
 class ResponseGenerator:
     """
     Gerador de respostas automáticas baseado em templates e IA (Gemini)
     """
     
+    # Incrementar sempre que os templates ou o prompt mudarem (invalida resultados em cache)
+    PROMPT_VERSION = "responder-v1"
+    
     def __init__(self):
         self.templates = self._load_templates()
+        self.keyword_matcher = self._load_keyword_matcher()
         self.gemini_client = None
         self._setup_gemini()
     
@@ -34,6 +55,18 @@ class ResponseGenerator:
             ]
         }
     
+    def _load_keyword_matcher(self) -> KeywordMatcher:
+        """Compila as palavras-chave de tipo de solicitação e de mensagem social"""
+        return KeywordMatcher({
+            "status": ['status', 'situação', 'andamento', 'progresso'],
+            "suporte": ['suporte', 'ajuda', 'problema', 'erro', 'bug'],
+            "pagamento": ['pagamento', 'fatura', 'cobrança', 'financeiro'],
+            "sistema": ['sistema', 'plataforma', 'aplicação', 'software'],
+            "greeting": ['olá', 'oi', 'bom dia', 'boa tarde', 'boa noite', 'hello', 'hi'],
+            "thanks": ['obrigado', 'obrigada', 'agradeço', 'thanks', 'thank you'],
+            "holiday": ['natal', 'ano novo', 'feliz', 'parabéns', 'felicitações'],
+        })
+    
     def _setup_gemini(self):
         """Configura cliente Gemini se disponível"""
         try:
@@ -84,30 +117,137 @@ class ResponseGenerator:
             logger.error(f"Erro ao gerar resposta: {e}")
             return self._get_fallback_response(category)
     
+    async def agenerate(self, category: str, text: str) -> str:
+        """
+        Versão assíncrona de generate, sem bloquear o event loop durante a chamada ao Gemini
+        
+        Args:
+            category (str): Categoria do email ('Produtivo' ou 'Improdutivo')
+            text (str): Texto do email original
+            
+        Returns:
+            str: Resposta gerada
+        """
+        try:
+            if category == "Produtivo":
+                return await self._agenerate_productive_response(text)
+            else:
+                return self._generate_unproductive_response(text)
+                
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta: {e}")
+            return self._get_fallback_response(category)
+    
+    async def astream(self, category: str, text: str) -> AsyncIterator[str]:
+        """
+        Gera a resposta em partes, à medida que o Gemini produz os tokens
+        
+        Só o caminho produtivo "general" com Gemini é de fato transmitido em
+        streaming; templates e respostas prontas saem como um único trecho.
+        
+        Args:
+            category (str): Categoria do email ('Produtivo' ou 'Improdutivo')
+            text (str): Texto do email original
+            
+        Yields:
+            str: Trechos da resposta
+        
+        Raises:
+            StreamInterruptedError: O Gemini falhou depois do primeiro trecho
+                (a resposta recebida até ali está incompleta)
+        """
+        if (
+            category != "Produtivo"
+            or not self.gemini_client
+            or self._request_type_response(self._detect_request_type(text)) is not None
+        ):
+            yield await self.agenerate(category, text)
+            return
+        
+        # A leitura do Gemini roda em uma tarefa à parte e libera o semáforo assim
+        # que o stream termina, sem depender da velocidade do cliente SSE
+        queue: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(self._read_gemini_stream(text, queue))
+        emitted = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    if not emitted:
+                        yield self._get_random_template("Produtivo")
+                        return
+                    raise StreamInterruptedError(f"Stream do Gemini interrompido: {item}") from item
+                emitted = True
+                yield item
+        finally:
+            reader.cancel()
+    
+    async def _read_gemini_stream(self, text: str, queue: asyncio.Queue):
+        """Lê o stream do Gemini (dentro do semáforo) para a fila; erros também vão para a fila"""
+        try:
+            async with gemini_semaphore():
+                stream = self.gemini_client.aio.models.generate_content_stream(
+                    model="gemini-2.5-flash",
+                    contents=self._build_reply_prompt(text, "productive")
+                )
+                # Versões do SDK variam entre gerador assíncrono e corrotina que o retorna
+                if inspect.isawaitable(stream):
+                    stream = await stream
+                async for chunk in stream:
+                    if chunk.text:
+                        queue.put_nowait(chunk.text)
+            queue.put_nowait(_STREAM_END)
+        except Exception as e:
+            logger.error(f"Erro no streaming da resposta com Gemini: {e}")
+            queue.put_nowait(e)
+    
+    def _request_type_response(self, response_type: str) -> Optional[str]:
+        """Resposta pronta para tipos específicos de solicitação (None para 'general')"""
+        if response_type == "status":
+            return "Obrigado pelo contato. Verificaremos o status da sua solicitação e retornaremos as informações em até 24 horas úteis."
+        
+        elif response_type == "suporte":
+            return "Recebemos sua solicitação de suporte técnico. Nossa equipe especializada está analisando o caso e entrará em contato em breve."
+        
+        elif response_type == "pagamento":
+            return "Obrigado pela sua mensagem sobre questões financeiras. Nossa equipe financeira analisará o caso e retornará em até 48 horas úteis."
+        
+        elif response_type == "sistema":
+            return "Recebemos sua solicitação relacionada ao sistema. Nossa equipe técnica está investigando e retornará com uma solução em breve."
+        
+        return None
+    
     def _generate_productive_response(self, text: str) -> str:
         """Gera resposta para emails produtivos"""
         try:
             # Detectar tipo específico de solicitação
-            response_type = self._detect_request_type(text)
-            
-            if response_type == "status":
-                return "Obrigado pelo contato. Verificaremos o status da sua solicitação e retornaremos as informações em até 24 horas úteis."
+            response = self._request_type_response(self._detect_request_type(text))
+            if response:
+                return response
             
-            elif response_type == "suporte":
-                return "Recebemos sua solicitação de suporte técnico. Nossa equipe especializada está analisando o caso e entrará em contato em breve."
-            
-            elif response_type == "pagamento":
-                return "Obrigado pela sua mensagem sobre questões financeiras. Nossa equipe financeira analisará o caso e retornará em até 48 horas úteis."
-            
-            elif response_type == "sistema":
-                return "Recebemos sua solicitação relacionada ao sistema. Nossa equipe técnica está investigando e retornará com uma solução em breve."
+            # Usar IA se disponível para casos complexos
+            if self.gemini_client:
+                return self._generate_ai_response(text, "productive")
+            else:
+                return self._get_random_template("Produtivo")
+                    
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta produtiva: {e}")
+            return self._get_random_template("Produtivo")
+    
+    async def _agenerate_productive_response(self, text: str) -> str:
+        """Versão assíncrona de _generate_productive_response"""
+        try:
+            response = self._request_type_response(self._detect_request_type(text))
+            if response:
+                return response
             
+            if self.gemini_client:
+                return await self._agenerate_gemini_response(text, "productive")
             else:
-                # Usar IA se disponível para casos complexos
-                if self.gemini_client:
-                    return self._generate_ai_response(text, "productive")
-                else:
-                    return self._get_random_template("Produtivo")
+                return self._get_random_template("Produtivo")
                     
         except Exception as e:
             logger.error(f"Erro ao gerar resposta produtiva: {e}")
@@ -116,14 +256,15 @@ class ResponseGenerator:
     def _generate_unproductive_response(self, text: str) -> str:
         """Gera resposta para emails improdutivos"""
         try:
-            # Detectar tipo de mensagem
-            if self._is_greeting(text):
+            # Detectar tipo de mensagem (uma única passada sobre o texto)
+            counts = self.keyword_matcher.count(text)
+            if counts["greeting"]:
                 return "Obrigado pela sua mensagem de cumprimento. Registramos seu contato em nosso sistema."
             
-            elif self._is_thanks(text):
+            elif counts["thanks"]:
                 return "Agradecemos o seu agradecimento. É um prazer poder ajudá-lo."
             
-            elif self._is_holiday(text):
+            elif counts["holiday"]:
                 return "Obrigado pela sua mensagem de felicitações. Desejamos a você também um excelente período."
             
             else:
@@ -135,36 +276,25 @@ class ResponseGenerator:
     
     def _detect_request_type(self, text: str) -> str:
         """Detecta o tipo específico de solicitação"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['status', 'situação', 'andamento', 'progresso']):
-            return "status"
-        
-        elif any(word in text_lower for word in ['suporte', 'ajuda', 'problema', 'erro', 'bug']):
-            return "suporte"
+        counts = self.keyword_matcher.count(text)
         
-        elif any(word in text_lower for word in ['pagamento', 'fatura', 'cobrança', 'financeiro']):
-            return "pagamento"
-        
-        elif any(word in text_lower for word in ['sistema', 'plataforma', 'aplicação', 'software']):
-            return "sistema"
+        for request_type in ("status", "suporte", "pagamento", "sistema"):
+            if counts[request_type]:
+                return request_type
         
         return "general"
     
     def _is_greeting(self, text: str) -> bool:
         """Verifica se é uma mensagem de cumprimento"""
-        greetings = ['olá', 'oi', 'bom dia', 'boa tarde', 'boa noite', 'hello', 'hi']
-        return any(greeting in text.lower() for greeting in greetings)
+        return self.keyword_matcher.count(text)["greeting"] > 0
     
     def _is_thanks(self, text: str) -> bool:
         """Verifica se é uma mensagem de agradecimento"""
-        thanks = ['obrigado', 'obrigada', 'agradeço', 'thanks', 'thank you']
-        return any(thank in text.lower() for thank in thanks)
+        return self.keyword_matcher.count(text)["thanks"] > 0
     
     def _is_holiday(self, text: str) -> bool:
         """Verifica se é uma mensagem de feriado"""
-        holidays = ['natal', 'ano novo', 'feliz', 'parabéns', 'felicitações']
-        return any(holiday in text.lower() for holiday in holidays)
+        return self.keyword_matcher.count(text)["holiday"] > 0
     
     def _generate_ai_response(self, text: str, category: str) -> str:
         """Gera resposta usando IA (Gemini)"""
@@ -178,10 +308,9 @@ class ResponseGenerator:
             logger.error(f"Erro ao gerar resposta com IA: {e}")
             return self._get_random_template(category.title())
     
-    def _generate_gemini_response(self, text: str, category: str) -> str:
-        """Gera resposta usando Gemini API"""
-        try:
-            prompt = f"""
+    def _build_reply_prompt(self, text: str, category: str) -> str:
+        """Monta o prompt de geração de resposta"""
+        return f"""
             Você é um assistente de atendimento ao cliente de uma empresa financeira.
             
             Categoria do email: {category}
@@ -191,10 +320,13 @@ class ResponseGenerator:
             A resposta deve ser adequada para a categoria identificada.
             Máximo 2 frases.
             """
-            
+    
+    def _generate_gemini_response(self, text: str, category: str) -> str:
+        """Gera resposta usando Gemini API"""
+        try:
             response = self.gemini_client.models.generate_content(
                 model="gemini-2.5-flash",
-                contents=prompt
+                contents=self._build_reply_prompt(text, category)
             )
             
             return response.text.strip()
@@ -203,6 +335,20 @@ class ResponseGenerator:
             logger.error(f"Erro ao gerar resposta com Gemini: {e}")
             return self._get_random_template(category.title())
     
+    async def _agenerate_gemini_response(self, text: str, category: str) -> str:
+        """Gera resposta usando o cliente async do Gemini, respeitando o limite de concorrência"""
+        try:
+            async with gemini_semaphore():
+                response = await self.gemini_client.aio.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=self._build_reply_prompt(text, category)
+                )
+            
+            return response.text.strip()
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta com Gemini: {e}")
+            return self._get_random_template(category.title())
     
     def _get_random_template(self, category: str) -> str:
         """Retorna um template aleatório da categoria"""
@@ -212,6 +358,19 @@ class ResponseGenerator:
             return random.choice(templates)
         return "Obrigado pelo seu contato. Registramos sua mensagem em nosso sistema."
     
+    def is_template_fallback(self, category: str, text: str, response: str) -> bool:
+        """
+        Indica se a resposta é um template usado porque o Gemini falhou
+
+        Com Gemini configurado, emails produtivos "general" sempre recebem
+        resposta da IA; um template nesse caso é sinal de falha temporária.
+        """
+        if self.gemini_client is None or category != "Produtivo":
+            return False
+        if self._request_type_response(self._detect_request_type(text)) is not None:
+            return False
+        return response in self.templates.get("Produtivo", []) or response == self._get_fallback_response(category)
+    
     def _get_fallback_response(self, category: str) -> str:
         """Resposta de fallback em caso de erro"""
         if category == "Produtivo":
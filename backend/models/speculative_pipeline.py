@@ -0,0 +1,90 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SpeculativePipeline:
+    """
+    Geração de resposta especulativa em paralelo com a classificação
+
+    A camada barata (modelo local ou palavras-chave) dá um palpite de categoria
+    quase instantâneo; a resposta para esse palpite começa a ser gerada junto com
+    a classificação no Gemini. Se a categoria final confirmar o palpite, a
+    resposta já está pronta (ou quase); senão a tarefa é cancelada e a resposta é
+    gerada de novo para a categoria correta.
+    """
+
+    mode = "speculative"
+
+    def __init__(self, classifier, response_generator):
+        self.classifier = classifier
+        self.response_generator = response_generator
+        self.hits = 0
+        self.misses = 0
+
+    async def _reply_for(self, text: str, guess: str, speculative: asyncio.Task, final_category: str) -> str:
+        """Reaproveita a resposta especulativa ou regenera para a categoria final"""
+        if final_category == guess:
+            self.hits += 1
+            return await speculative
+        self.misses += 1
+        speculative.cancel()
+        logger.info(f"Especulação descartada: palpite {guess}, categoria final {final_category}")
+        return await self.response_generator.agenerate(final_category, text)
+
+    async def arun(self, text: str):
+        """
+        Classifica e gera a resposta de um email, especulando a categoria
+
+        Args:
+            text (str): Texto normalizado do email
+
+        Returns:
+            Tuple[ClassificationResult, str]: Classificação e resposta sugerida
+        """
+        guess = self.classifier.guess_category(text)
+        speculative = asyncio.create_task(self.response_generator.agenerate(guess, text))
+        try:
+            classification = await self.classifier.apredict(text)
+        except BaseException:
+            speculative.cancel()
+            raise
+        return classification, await self._reply_for(text, guess, speculative, classification.category)
+
+    async def arun_batch(self, texts: List[str]) -> List[Tuple[Any, str]]:
+        """Versão em lote de arun: respostas especulativas em paralelo com a classificação em lote"""
+        guesses = [self.classifier.guess_category(text) for text in texts]
+        speculative = [
+            asyncio.create_task(self.response_generator.agenerate(guess, text))
+            for guess, text in zip(guesses, texts)
+        ]
+        try:
+            classifications = await self.classifier.apredict_batch(texts)
+        except BaseException:
+            for task in speculative:
+                task.cancel()
+            raise
+        replies = await asyncio.gather(*[
+            self._reply_for(text, guess, task, classification.category)
+            for text, guess, task, classification in zip(texts, guesses, speculative, classifications)
+        ])
+        return list(zip(classifications, replies))
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os acertos e erros de especulação"""
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+def build_speculative_pipeline(classifier, response_generator) -> Optional[SpeculativePipeline]:
+    """
+    Cria o pipeline especulativo quando PIPELINE_MODE=speculative
+    """
+    if os.getenv("PIPELINE_MODE", "separate").lower() != "speculative":
+        return None
+    return SpeculativePipeline(classifier, response_generator)
@@ -19,6 +19,7 @@ class User(Base):
     gmail_credentials = Column(JSON, nullable=True)  # Credenciais do Gmail
     gmail_connected = Column(Boolean, default=False)
     gmail_last_sync = Column(DateTime, nullable=True)
+    gmail_history_id = Column(String(32), nullable=True)  # historyId da última sincronização incremental
     
     # Preferências do usuário
     preferences = Column(JSON, nullable=True)  # Preferências do usuário
@@ -0,0 +1,106 @@
+"""
+Treina o modelo local (regressão logística com features hasheadas)
+
+O corpus é um JSONL com um email por linha no formato
+{"text": "...", "label": "Produtivo" | "Improdutivo"}. Os textos passam pelo
+mesmo TextProcessor usado na API, e uma fração é separada para validação.
+
+Uso:
+    python backend/scripts/train_local_model.py corpus.jsonl --output backend/models/local_model.npz
+"""
+import sys
+import json
+import random
+import argparse
+from pathlib import Path
+
+# Configurar PYTHONPATH para importar módulos do backend
+backend_root = Path(__file__).resolve().parent.parent
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from utils.text_processor import TextProcessor
+from models.local_model import HashedLogisticModel
+
+LABEL_VALUES = {"produtivo": 1, "improdutivo": 0}
+
+
+def load_corpus(path: str, text_processor: TextProcessor):
+    """Lê o JSONL e retorna (textos normalizados, rótulos 0/1)"""
+    texts, labels = [], []
+    skipped = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                # JSON válido mas que não é objeto (lista, string, número) também é ignorado
+                if not isinstance(item, dict):
+                    raise ValueError(f"esperado um objeto JSON, encontrado {type(item).__name__}")
+                label = LABEL_VALUES[str(item["label"]).strip().lower()]
+                text = item.get("text", "")
+                if not isinstance(text, str):
+                    raise ValueError(f"campo text deve ser string, encontrado {type(text).__name__}")
+            except (ValueError, KeyError) as e:
+                print(f"Linha {line_number} ignorada: {e}")
+                skipped += 1
+                continue
+            processed = text_processor.process(text)
+            if processed:
+                texts.append(processed)
+                labels.append(label)
+    if skipped:
+        print(f"{skipped} linhas inválidas ignoradas")
+    return texts, labels
+
+
+def accuracy(model: HashedLogisticModel, texts, labels) -> float:
+    if not texts:
+        return 0.0
+    hits = sum((model.predict_proba(text) >= 0.5) == bool(label) for text, label in zip(texts, labels))
+    return hits / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o modelo local de classificação de emails")
+    parser.add_argument("corpus", help="Arquivo JSONL com campos text e label")
+    parser.add_argument("--output", default=str(backend_root / "models" / "local_model.npz"))
+    parser.add_argument("--n-features", type=int, default=2 ** 16)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-6)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fração separada para validação")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts, labels = load_corpus(args.corpus, TextProcessor())
+    if not texts:
+        print("Corpus vazio, nada para treinar")
+        return 1
+
+    pairs = list(zip(texts, labels))
+    random.Random(args.seed).shuffle(pairs)
+    split = int(len(pairs) * (1 - args.holdout))
+    train, holdout = pairs[:split], pairs[split:]
+    train_texts, train_labels = [p[0] for p in train], [p[1] for p in train]
+    holdout_texts, holdout_labels = [p[0] for p in holdout], [p[1] for p in holdout]
+
+    model = HashedLogisticModel(n_features=args.n_features)
+    model.fit(train_texts, train_labels, epochs=args.epochs, batch_size=args.batch_size,
+              learning_rate=args.learning_rate, l2=args.l2, seed=args.seed)
+
+    print(f"Exemplos: {len(train)} treino / {len(holdout)} validação")
+    print(f"Acurácia treino: {accuracy(model, train_texts, train_labels):.3f}")
+    if holdout:
+        print(f"Acurácia validação: {accuracy(model, holdout_texts, holdout_labels):.3f}")
+
+    model.save(args.output)
+    print(f"Pesos salvos em {args.output} ({Path(args.output).stat().st_size} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+try:
+    from utils.text_processor import TextProcessor
+except ImportError:
+    from backend.utils.text_processor import TextProcessor
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Processador reutilizado dentro de cada processo worker
+_worker_processor = None
+
+
+def _extract_in_worker(content: bytes, filename: str) -> str:
+    """Executa a extração dentro do processo worker (precisa ser picklável)"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = TextProcessor()
+    return _worker_processor.process_file(content, filename)
+
+
+class FileExtractor:
+    """
+    Backend de extração de arquivos (PDF/TXT) fora do event loop
+
+    Backends disponíveis (FILE_EXTRACTION_BACKEND):
+    - "process": pool de processos limitado, com timeout por job e reciclagem de workers
+    - "thread": executor de threads padrão do event loop (útil em serverless)
+    """
+
+    BACKENDS = ("process", "thread")
+
+    def __init__(self, text_processor: Optional[TextProcessor] = None, backend: Optional[str] = None,
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 max_bytes: Optional[int] = None, max_jobs_per_worker: Optional[int] = None):
+        default_backend = "thread" if (os.getenv("VERCEL_ENV") or os.getenv("VERCEL")) else "process"
+        self.backend = (backend or os.getenv("FILE_EXTRACTION_BACKEND", default_backend)).lower()
+        if self.backend not in self.BACKENDS:
+            logger.warning(f"Backend de extração desconhecido '{self.backend}', usando 'thread'")
+            self.backend = "thread"
+
+        self.text_processor = text_processor or TextProcessor()
+        self.max_workers = max_workers or int(os.getenv("FILE_EXTRACTION_WORKERS", "2"))
+        self.timeout = timeout or float(os.getenv("FILE_EXTRACTION_TIMEOUT", "20"))
+        self.max_bytes = max_bytes or int(os.getenv("FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv("FILE_EXTRACTION_MAX_JOBS_PER_WORKER", "100"))
+
+        self._pool = None
+        self._jobs_in_pool = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Retorna o pool atual, reciclando os workers após N jobs para limitar o uso de memória"""
+        with self._lock:
+            if self._pool is not None and self._jobs_in_pool >= self.max_jobs_per_worker * self.max_workers:
+                logger.info("Reciclando pool de extração de arquivos")
+                # Jobs já enviados ao pool antigo terminam normalmente
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._jobs_in_pool = 0
+            self._jobs_in_pool += 1
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """
+        Tira de uso um pool com job travado e agenda o encerramento dos seus processos
+
+        O pool é compartilhado: outros jobs podem estar rodando nele. Novos jobs
+        já vão para um pool novo, e os processos do antigo só são encerrados
+        depois de mais um timeout, quando qualquer outro job enviado a ele já
+        terminou ou estourou o próprio prazo.
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        # ProcessPoolExecutor não expõe terminate() e shutdown() esquece os
+        # processos; sem guardá-los o worker travado continuaria consumindo CPU
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False)
+        asyncio.get_running_loop().call_later(self.timeout, self._terminate_processes, processes)
+
+    @staticmethod
+    def _terminate_processes(processes):
+        """Encerra os processos que ainda restam de um pool descartado (o job travado)"""
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    async def extract(self, content: bytes, filename: str) -> str:
+        """
+        Extrai e processa o texto do arquivo sem bloquear o event loop
+
+        Args:
+            content (bytes): Conteúdo do arquivo
+            filename (str): Nome do arquivo
+
+        Returns:
+            str: Texto extraído e processado
+
+        Raises:
+            ValueError: Arquivo maior que FILE_MAX_BYTES ou tipo não suportado
+            asyncio.TimeoutError: Extração excedeu FILE_EXTRACTION_TIMEOUT
+            BrokenProcessPool: Um worker do pool morreu (ex.: falta de memória)
+        """
+        if len(content) > self.max_bytes:
+            raise ValueError(f"Arquivo excede o tamanho máximo de {self.max_bytes} bytes")
+
+        loop = asyncio.get_running_loop()
+        if self.backend == "thread":
+            return await asyncio.wait_for(
+                loop.run_in_executor(None, self.text_processor.process_file, content, filename),
+                timeout=self.timeout
+            )
+
+        pool = self._get_pool()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(pool, _extract_in_worker, content, filename),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout ao extrair texto de {filename} após {self.timeout}s")
+            self._discard_pool(pool)
+            raise
+        except BrokenProcessPool:
+            # Worker morto (OOM, PDF que derruba o processo): o pool não aceita
+            # mais jobs, então a próxima extração já cria um novo
+            logger.error(f"Pool de extração quebrado ao processar {filename}; criando um novo")
+            self._discard_pool(pool)
+            raise
+
+    def shutdown(self):
+        """Encerra o pool de processos"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
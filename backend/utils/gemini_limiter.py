@@ -0,0 +1,17 @@
+import os
+import asyncio
+
+# Semáforo compartilhado por classificador e gerador de respostas
+_semaphore = None
+
+
+def gemini_semaphore() -> asyncio.Semaphore:
+    """
+    Retorna o semáforo que limita as chamadas simultâneas ao Gemini neste processo
+
+    O limite é configurado por GEMINI_MAX_CONCURRENCY (padrão: 32).
+    """
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")))
+    return _semaphore
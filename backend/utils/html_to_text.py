@@ -0,0 +1,187 @@
+import os
+import re
+import logging
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Union
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Caracteres de texto extraídos de um corpo HTML; o resto do documento nem é lido
+HTML_TEXT_MAX_CHARS = int(os.getenv("HTML_TEXT_MAX_CHARS", "8000"))
+
+# Tamanho dos pedaços entregues ao parser entre as verificações do orçamento
+FEED_CHUNK_SIZE = 8192
+
+# Conteúdo que nunca é texto visível
+SKIPPED_TAGS = {"style", "script", "head", "title", "noscript", "template", "svg"}
+
+# Tags que não têm fechamento (não entram na contagem de aninhamento)
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# Tags que quebram linha no texto
+BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "section", "article", "header", "footer", "hr", "pre",
+}
+
+# Células de tabela viram espaço entre os textos
+SPACING_TAGS = {"td", "th"}
+
+# Elementos ocultos que podem conter blocos; os demais (p, span, a, font...) são
+# fechados implicitamente pelo início de um bloco ou pelo fim do elemento pai,
+# como no parser do navegador, e não escondem o resto do documento
+CONTAINER_TAGS = {
+    "div", "table", "tbody", "thead", "tfoot", "tr", "td", "th", "ul", "ol", "li",
+    "section", "article", "header", "footer", "blockquote", "center", "body", "html",
+}
+
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden|max-height\s*:\s*0", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+class _BudgetReached(Exception):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    """Parser incremental que guarda só o texto visível, até max_chars caracteres"""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.chunks: List[str] = []
+        self.length = 0
+        # Subárvore ignorada: (tag que abriu, profundidade de aninhamento da mesma tag)
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._pending_break = False
+        self._pending_space = False
+
+    @staticmethod
+    def _is_hidden(attrs) -> bool:
+        attributes = dict(attrs)
+        return "hidden" in attributes or bool(_HIDDEN_STYLE.search(attributes.get("style") or ""))
+
+    @staticmethod
+    def _is_tracking_pixel(attrs) -> bool:
+        attributes = dict(attrs)
+        for dimension in ("width", "height"):
+            value = (attributes.get(dimension) or "").strip().lower().rstrip("px")
+            if value.isdigit() and int(value) <= 1:
+                return True
+        return _TextExtractor._is_hidden(attrs)
+
+    def _append(self, text: str):
+        if self._pending_break and self.chunks:
+            self.chunks.append("\n")
+            self.length += 1
+        elif self._pending_space and self.chunks:
+            self.chunks.append(" ")
+            self.length += 1
+        self._pending_break = False
+        self._pending_space = False
+        remaining = self.max_chars - self.length
+        self.chunks.append(text[:remaining])
+        self.length += min(len(text), remaining)
+        if self.length >= self.max_chars:
+            raise _BudgetReached()
+
+    def _handle_empty(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._pending_break = True
+        elif tag in SPACING_TAGS:
+            self._pending_space = True
+        # Imagens contribuem só com o alt; pixels de rastreamento são ignorados
+        if tag == "img" and not self._is_tracking_pixel(attrs):
+            alt = (dict(attrs).get("alt") or "").strip()
+            if alt:
+                self._append(f" {alt} ")
+
+    def _closes_skipped(self, tag: str) -> bool:
+        """Tag de bloco que fecha implicitamente um elemento oculto sem fechamento explícito"""
+        return (
+            self._skip_tag not in CONTAINER_TAGS
+            and self._skip_tag not in SKIPPED_TAGS
+            and (tag in BLOCK_TAGS or tag in SPACING_TAGS)
+        )
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag is not None:
+            # Um <p> também fecha o <p> oculto anterior (não há <p> aninhado)
+            if not self._closes_skipped(tag):
+                if tag == self._skip_tag:
+                    self._skip_depth += 1
+                return
+            self._skip_tag, self._skip_depth = None, 0
+        if tag in SKIPPED_TAGS or (tag not in VOID_TAGS and self._is_hidden(attrs)):
+            self._skip_tag, self._skip_depth = tag, 1
+            return
+        self._handle_empty(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <img/>: sem conteúdo, nunca abrem subárvore ignorada
+        if self._skip_tag is not None:
+            return
+        self._handle_empty(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+                return
+            if not self._closes_skipped(tag):
+                return
+            # Fim do elemento pai: o oculto também termina aqui
+            self._skip_tag, self._skip_depth = None, 0
+        if tag in BLOCK_TAGS:
+            self._pending_break = True
+        elif tag in SPACING_TAGS:
+            self._pending_space = True
+
+    def handle_data(self, data):
+        if self._skip_tag is not None:
+            return
+        text = _SPACES.sub(" ", data.replace("\n", " "))
+        if text.strip():
+            self._append(text)
+
+
+def html_to_text(html: Union[str, Iterable[str]], max_chars: int = HTML_TEXT_MAX_CHARS) -> str:
+    """
+    Converte HTML em texto simples, em streaming e com orçamento de caracteres
+
+    O HTML é entregue ao parser em pedaços (ou já chega em pedaços, de um
+    iterável) e a leitura para assim que max_chars caracteres de texto
+    visível foram extraídos. Conteúdo de
+    <style>/<script>/<head>, elementos ocultos e pixels de rastreamento são
+    descartados; blocos viram quebras de linha.
+
+    Args:
+        html (Union[str, Iterable[str]]): Documento HTML ou pedaços dele, em ordem
+        max_chars (int): Máximo de caracteres de texto retornados
+
+    Returns:
+        str: Texto visível do HTML
+    """
+    if not html:
+        return ""
+    parser = _TextExtractor(max_chars)
+    if isinstance(html, str):
+        chunks = (html[start:start + FEED_CHUNK_SIZE] for start in range(0, len(html), FEED_CHUNK_SIZE))
+    else:
+        chunks = html
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+    except _BudgetReached:
+        pass
+    except Exception as e:
+        # HTMLParser é tolerante; qualquer falha rara fica com o texto já extraído
+        logger.warning(f"Erro ao converter HTML em texto: {e}")
+    lines = (line.strip() for line in "".join(parser.chunks).split("\n"))
+    return "\n".join(line for line in lines if line)
@@ -0,0 +1,120 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeywordMatcher:
+    """
+    Matcher de palavras-chave multi-padrão (Aho-Corasick sobre palavras)
+
+    O autômato é construído uma única vez a partir das listas de palavras-chave
+    por categoria. Como o alfabeto são palavras inteiras (e não caracteres), os
+    matches respeitam fronteiras de palavra: 'oi' não casa dentro de 'noite' ou
+    'foi', e expressões como 'bom dia' casam como sequência de palavras.
+
+    A última palavra de cada palavra-chave também casa formas flexionadas que
+    começam por ela ('erros', 'problemas', 'urgentes'); em '-ão' o radical é
+    a palavra sem a terminação, para cobrir '-ões' ('solicitações'). Palavras
+    com menos de MIN_PREFIX_LENGTH letras ('oi', 'olá') só casam inteiras.
+    """
+
+    _token_pattern = re.compile(r'\w+')
+
+    MIN_PREFIX_LENGTH = 4
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = list(categories)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        # Palavras da trie e radical -> palavra da trie (para as formas flexionadas)
+        self._vocabulary = set()
+        self._stems: Dict[str, str] = {}
+
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._add_keyword(category, keyword)
+        self._build_failure_links()
+
+    def _add_keyword(self, category: str, keyword: str):
+        """Insere a sequência de palavras da palavra-chave na trie"""
+        tokens = self._token_pattern.findall(keyword.lower())
+        if not tokens:
+            return
+        self._vocabulary.update(tokens)
+        last = tokens[-1]
+        stem = last[:-2] if last.endswith("ão") else last
+        if len(stem) >= self.MIN_PREFIX_LENGTH:
+            self._stems.setdefault(stem, last)
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((category, keyword))
+
+    def _build_failure_links(self):
+        """Calcula os links de falha em BFS e propaga as saídas dos sufixos"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _canonical(self, token: str) -> str:
+        """Palavra da trie correspondente ao token (ele mesmo ou a palavra-chave do maior radical)"""
+        if token in self._vocabulary:
+            return token
+        for length in range(len(token) - 1, self.MIN_PREFIX_LENGTH - 1, -1):
+            keyword_token = self._stems.get(token[:length])
+            if keyword_token is not None:
+                return keyword_token
+        return token
+
+    def count(self, text: str, distinct: bool = True) -> Dict[str, int]:
+        """
+        Conta as palavras-chave encontradas por categoria em uma única passada
+
+        Args:
+            text (str): Texto a ser analisado
+            distinct (bool): Conta cada palavra-chave no máximo uma vez (padrão)
+
+        Returns:
+            Dict[str, int]: Número de palavras-chave encontradas por categoria
+        """
+        counts = dict.fromkeys(self.categories, 0)
+        if not text:
+            return counts
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        root = goto[0]
+        seen = set()
+        node = 0
+        canonical = self._canonical
+        for token in self._token_pattern.findall(text.lower()):
+            token = canonical(token)
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0) if node else root.get(token, 0)
+            if not node:
+                continue
+            for match in output[node]:
+                if distinct:
+                    if match in seen:
+                        continue
+                    seen.add(match)
+                counts[match[0]] += 1
+        return counts
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+
+# Mesmo limite de caracteres que o classificador usa: emails enormes não
+# dominam a CPU e o fingerprint cobre o trecho que de fato foi classificado
+SIMHASH_MAX_CHARS = 1000
+
+# O índice guarda respostas geradas (dados pessoais): fica no diretório de
+# dados da aplicação, não em /tmp, e o arquivo só é legível pelo dono
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent.parent / "data" / "near_duplicates.json"
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(processed_text: str) -> Tuple[int, int]:
+    """
+    Calcula o SimHash de 64 bits do texto normalizado
+
+    Args:
+        processed_text (str): Texto já processado pelo TextProcessor
+
+    Returns:
+        Tuple[int, int]: (fingerprint, número de tokens)
+    """
+    tokens = processed_text[:SIMHASH_MAX_CHARS].split()
+    weights = Counter(tokens)
+    hashed = [(_token_hash(token), weight) for token, weight in weights.items()]
+    total = sum(weights.values())
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        mask = 1 << bit
+        # Bit ligado quando o peso dos tokens com o bit ligado supera a metade
+        if 2 * sum(weight for value, weight in hashed if value & mask) > total:
+            fingerprint |= mask
+    return fingerprint, len(tokens)
+
+
+class NearDuplicateIndex:
+    """
+    Índice de quase-duplicatas (SimHash) para reaproveitar classificações
+
+    Emails templados (notificações, respostas automáticas, marketing com o nome
+    trocado) geram fingerprints a poucos bits de distância. A busca usa bandas:
+    o fingerprint é dividido em max_distance + 1 faixas e, pelo princípio da casa
+    dos pombos, qualquer vizinho dentro da distância compartilha ao menos uma
+    faixa exata. O índice é limitado por LRU e pode ser salvo em disco.
+
+    Com path, o índice é salvo a cada save_interval segundos (na próxima
+    inserção após o prazo) e no encerramento. Vários workers podem usar o mesmo
+    arquivo: cada gravação mescla, sob trava, o que os outros já salvaram.
+    """
+
+    def __init__(self, max_distance: int = 6, max_entries: int = 10000,
+                 min_tokens: int = 8, path: Optional[str] = None, save_interval: float = 60.0):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self.path = path
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [
+            (index * width, (FINGERPRINT_BITS if index == bands - 1 else (index + 1) * width) - index * width)
+            for index in range(bands)
+        ]
+        self._entries = OrderedDict()  # fingerprint -> valor
+        self._buckets: Dict[Tuple[int, int], set] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        if self.path:
+            self.load()
+
+    def _band_keys(self, fingerprint: int):
+        for index, (shift, width) in enumerate(self._bands):
+            yield index, (fingerprint >> shift) & ((1 << width) - 1)
+
+    def _insert(self, fingerprint: int, value: Dict[str, Any]):
+        if fingerprint in self._entries:
+            self._entries.move_to_end(fingerprint)
+            self._entries[fingerprint] = value
+            return
+        self._entries[fingerprint] = value
+        for key in self._band_keys(fingerprint):
+            self._buckets.setdefault(key, set()).add(fingerprint)
+        while len(self._entries) > self.max_entries:
+            old_fingerprint, _ = self._entries.popitem(last=False)
+            for key in self._band_keys(old_fingerprint):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(old_fingerprint)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def lookup(self, processed_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca um resultado de um email quase idêntico
+
+        Args:
+            processed_text (str): Texto já processado pelo TextProcessor
+
+        Returns:
+            Optional[Dict[str, Any]]: Resultado armazenado do vizinho mais próximo, ou None
+        """
+        fingerprint, token_count = simhash(processed_text)
+        if token_count < self.min_tokens:
+            return None
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for key in self._band_keys(fingerprint):
+                for candidate in self._buckets.get(key, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def add(self, processed_text: str, value: Dict[str, Any]):
+        """Indexa o resultado de um email (textos curtos demais são ignorados)"""
+        fingerprint, token_count = simhash(processed_text)
+        if token_count < self.min_tokens:
+            return
+        with self._lock:
+            self._insert(fingerprint, value)
+            self._dirty = True
+            due = self.path and time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def save(self, path: Optional[str] = None):
+        """
+        Salva o índice em JSON (fingerprints em hexadecimal, ordem LRU preservada)
+
+        As entradas já salvas por outros workers no mesmo arquivo são mescladas
+        antes das deste processo (que ficam como as mais recentes).
+        """
+        path = path or self.path
+        if not path:
+            return
+        # Uma gravação por vez; se outra thread já está salvando, esta desiste
+        if not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                own = [[format(fingerprint, "x"), value] for fingerprint, value in self._entries.items()]
+                self._dirty = False
+                self._last_save = time.monotonic()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+            with open(f"{path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                merged = OrderedDict((fingerprint, value) for fingerprint, value in self._read_entries(path))
+                for fingerprint, value in own:
+                    merged.pop(fingerprint, None)
+                    merged[fingerprint] = value
+                data = list(merged.items())[-self.max_entries:]
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"max_distance": self.max_distance, "entries": data}, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            logger.info(f"Índice de quase-duplicatas salvo com {len(data)} entradas em {path}")
+        except Exception as e:
+            logger.error(f"Erro ao salvar índice de quase-duplicatas: {e}")
+        finally:
+            self._save_lock.release()
+
+    @staticmethod
+    def _read_entries(path: str):
+        """Entradas [fingerprint hexadecimal, valor] de um índice salvo ([] se não existir)"""
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("entries", [])
+
+    def load(self, path: Optional[str] = None):
+        """Carrega o índice salvo anteriormente, se existir"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            entries = self._read_entries(path)
+            with self._lock:
+                for fingerprint, value in entries:
+                    self._insert(int(fingerprint, 16), value)
+            logger.info(f"Índice de quase-duplicatas carregado com {len(self._entries)} entradas")
+        except Exception as e:
+            logger.error(f"Erro ao carregar índice de quase-duplicatas: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores do índice"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_distance": self.max_distance,
+        }
+
+
+def build_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """
+    Cria o índice de quase-duplicatas a partir das variáveis de ambiente
+
+    NEAR_DUP_ENABLED: habilita o índice (padrão: false)
+    NEAR_DUP_MAX_DISTANCE: distância de Hamming máxima entre fingerprints
+    NEAR_DUP_MAX_ENTRIES: número máximo de entradas (LRU)
+    NEAR_DUP_MIN_TOKENS: tamanho mínimo do texto normalizado, em tokens
+    NEAR_DUP_INDEX_PATH: arquivo JSON para persistir o índice entre reinícios
+        (padrão: data/near_duplicates.json no diretório do backend, permissão 0600)
+    NEAR_DUP_SAVE_INTERVAL: segundos entre gravações periódicas do índice
+    """
+    if os.getenv("NEAR_DUP_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return NearDuplicateIndex(
+        max_distance=int(os.getenv("NEAR_DUP_MAX_DISTANCE", "6")),
+        max_entries=int(os.getenv("NEAR_DUP_MAX_ENTRIES", "10000")),
+        min_tokens=int(os.getenv("NEAR_DUP_MIN_TOKENS", "8")),
+        path=os.getenv("NEAR_DUP_INDEX_PATH") or str(DEFAULT_INDEX_PATH),
+        save_interval=float(os.getenv("NEAR_DUP_SAVE_INTERVAL", "60")),
+    )
@@ -0,0 +1,86 @@
+import re
+import logging
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "Em seg., 1 de jan. de 2024 às 10:00, Fulano <f@x.com> escreveu:" / "On Mon, ... wrote:"
+_ATTRIBUTION_START = re.compile(r"^(em|on)\s.+", re.IGNORECASE)
+_ATTRIBUTION_END = re.compile(r"\b(escreveu|wrote)\s*:\s*$", re.IGNORECASE)
+# Estrutura de atribuição gerada pelo cliente de email: endereço (ou <...>),
+# horário ou data numérica. Sem isso, "Em 2024 ... o cliente escreveu:" é texto comum
+_ATTRIBUTION_DETAILS = re.compile(
+    r"<[^<>]+>|[\w.%+-]+@[\w-]+\.[\w.-]+|\b\d{1,2}:\d{2}\b|\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b"
+)
+
+# Cabeçalhos de mensagem encaminhada/citada no estilo Outlook
+_ORIGINAL_MESSAGE = re.compile(
+    r"^-{2,}\s*(original message|mensagem original|forwarded message|mensagem encaminhada)\s*-{2,}$",
+    re.IGNORECASE,
+)
+_HEADER_FROM = re.compile(r"^(de|from)\s*:\s*\S", re.IGNORECASE)
+_HEADER_NEXT = re.compile(r"^(enviado|enviada|sent|data|date|para|to)\s*:", re.IGNORECASE)
+
+# Delimitadores de assinatura e rodapés automáticos
+_SIGNATURE = re.compile(
+    r"^(__{5,}|enviado do meu \w+|enviado de meu \w+|sent from my \w+|"
+    r"aviso de confidencialidade|aviso legal|confidentiality notice|disclaimer)\b",
+    re.IGNORECASE,
+)
+
+
+def _is_cut_line(line: str, next_line: str) -> bool:
+    """Linha a partir da qual o resto do email é histórico citado ou assinatura"""
+    if not line:
+        return False
+    if line == "--" or _SIGNATURE.match(line) or _ORIGINAL_MESSAGE.match(line):
+        return True
+    if _ATTRIBUTION_START.match(line):
+        if _ATTRIBUTION_END.search(line):
+            return bool(_ATTRIBUTION_DETAILS.search(line))
+        # A atribuição pode vir quebrada em duas linhas pelo cliente de email
+        # (a segunda termina em "escreveu:")
+        return (
+            not _ATTRIBUTION_START.match(next_line)
+            and bool(_ATTRIBUTION_END.search(next_line))
+            and bool(_ATTRIBUTION_DETAILS.search(f"{line} {next_line}"))
+        )
+    return bool(_HEADER_FROM.match(line) and _HEADER_NEXT.match(next_line))
+
+
+def strip_quoted_reply(text: str) -> str:
+    """
+    Remove o histórico citado e a assinatura de um email, em uma única passada
+
+    Linhas citadas com ">" são descartadas; a partir da primeira atribuição
+    ("Em ... escreveu:", "On ... wrote:"), cabeçalho de mensagem original ou
+    delimitador de assinatura ("-- ", "Enviado do meu ...", avisos legais), o
+    resto do texto é ignorado. Se nada sobrar (email só com citação), o texto
+    original é mantido.
+
+    Args:
+        text (str): Corpo do email em texto simples
+
+    Returns:
+        str: Apenas a mensagem nova
+    """
+    if not text:
+        return ""
+    lines = text.splitlines()
+    kept = []
+    for index, raw_line in enumerate(lines):
+        line = raw_line.strip()
+        if line.startswith(">"):
+            continue
+        next_line = lines[index + 1].strip() if index + 1 < len(lines) else ""
+        if _is_cut_line(line, next_line):
+            break
+        kept.append(raw_line)
+
+    stripped = "\n".join(kept).strip()
+    if not stripped:
+        return text
+    if len(stripped) < len(text):
+        logger.debug(f"Citações/assinatura removidas: {len(text)} -> {len(stripped)} caracteres")
+    return stripped
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(processed_text: str, version: str = "") -> str:
+    """
+    Gera a chave do cache a partir do texto normalizado e da versão do modelo/prompt
+
+    Args:
+        processed_text (str): Texto já processado pelo TextProcessor
+        version (str): Identificador da versão de modelo/prompt
+
+    Returns:
+        str: Hash sha256 em hexadecimal
+    """
+    digest = hashlib.sha256()
+    digest.update(version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(processed_text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Cache em banco: limites conferidos a cada N inserções, eviction LRU em lotes
+# até ficar abaixo desta fração dos limites
+EVICTION_CHECK_INTERVAL = 100
+EVICTION_BATCH_SIZE = 500
+EVICTION_LOW_WATERMARK = 0.9
+
+
+class ResultCache:
+    """
+    Interface base do cache de resultados do pipeline de classificação
+
+    Mantém os contadores de hits/misses e de chamadas Gemini economizadas.
+    """
+
+    backend = "none"
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 1000, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.gemini_calls_saved = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if value.get("method") == "gemini":
+                    self.gemini_calls_saved += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        try:
+            self._set(key, value, len(json.dumps(value, ensure_ascii=False).encode("utf-8")))
+        except Exception as e:
+            logger.error(f"Erro ao gravar no cache de resultados: {e}")
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def _set(self, key: str, value: Dict[str, Any], size: int):
+        pass
+
+    def _count_eviction(self, count: int = 1):
+        with self._stats_lock:
+            self.evictions += count
+
+    def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores do cache"""
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "gemini_calls_saved": self.gemini_calls_saved,
+        }
+
+
+class MemoryResultCache(ResultCache):
+    """Cache em memória do processo com eviction LRU, TTL e orçamento em bytes"""
+
+    backend = "memory"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._total_bytes -= size
+                self._count_eviction()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Dict[str, Any], size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._total_bytes += size
+            evicted = 0
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted += 1
+        if evicted:
+            self._count_eviction(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"entries": len(self._entries), "bytes": self._total_bytes})
+        return stats
+
+
+class DatabaseResultCache(ResultCache):
+    """Cache persistente na tabela classification_cache do banco configurado em database.py"""
+
+    backend = "sqlite"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            from database import SessionLocal, engine
+            from models.cached_result import CachedResult
+        except ImportError:
+            from backend.database import SessionLocal, engine
+            from backend.models.cached_result import CachedResult
+        # A tabela pode não existir se create_tables() rodou antes do import do modelo
+        CachedResult.__table__.create(bind=engine, checkfirst=True)
+        self._session_factory = SessionLocal
+        self._model = CachedResult
+        self._inserts = 0
+        self._insert_lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        db = self._session_factory()
+        try:
+            entry = db.get(self._model, key)
+            if entry is None:
+                return None
+            now = datetime.utcnow()
+            if entry.created_at < now - timedelta(seconds=self.ttl_seconds):
+                db.delete(entry)
+                db.commit()
+                self._count_eviction()
+                return None
+            entry.last_access = now
+            db.commit()
+            return entry.value
+        except Exception as e:
+            logger.error(f"Erro ao ler o cache de resultados: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _set(self, key: str, value: Dict[str, Any], size: int):
+        if size > self.max_bytes:
+            return
+        db = self._session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(self._model(key=key, value=value, size_bytes=size, created_at=now, last_access=now))
+            # Expirar entradas antigas antes de aplicar os limites LRU
+            evicted = (
+                db.query(self._model)
+                .filter(self._model.created_at < now - timedelta(seconds=self.ttl_seconds))
+                .delete(synchronize_session=False)
+            )
+            # Contar a tabela inteira a cada inserção seria O(linhas); os limites
+            # são verificados a cada EVICTION_CHECK_INTERVAL inserções
+            with self._insert_lock:
+                self._inserts += 1
+                check_limits = self._inserts % EVICTION_CHECK_INTERVAL == 1
+            if check_limits:
+                evicted += self._evict_lru(db, key)
+            db.commit()
+            if evicted:
+                self._count_eviction(evicted)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _evict_lru(self, db, current_key: str) -> int:
+        """
+        Remove as entradas menos usadas até ficar abaixo de EVICTION_LOW_WATERMARK dos limites
+
+        Usa ORDER BY last_access LIMIT (índice) em lotes de EVICTION_BATCH_SIZE
+        chaves; a folga abaixo do limite evita reavaliar a cada inserção.
+        """
+        from sqlalchemy import func
+
+        count, total_bytes = db.query(
+            func.count(self._model.key), func.coalesce(func.sum(self._model.size_bytes), 0)
+        ).one()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return 0
+        target_entries = int(self.max_entries * EVICTION_LOW_WATERMARK)
+        target_bytes = int(self.max_bytes * EVICTION_LOW_WATERMARK)
+        evicted = 0
+        while count > target_entries or total_bytes > target_bytes:
+            oldest = (
+                db.query(self._model.key, self._model.size_bytes)
+                .filter(self._model.key != current_key)
+                .order_by(self._model.last_access.asc())
+                .limit(EVICTION_BATCH_SIZE)
+                .all()
+            )
+            if not oldest:
+                break
+            db.query(self._model).filter(self._model.key.in_([k for k, _ in oldest])).delete(synchronize_session=False)
+            count -= len(oldest)
+            total_bytes -= sum(size for _, size in oldest)
+            evicted += len(oldest)
+        return evicted
+
+    def clear(self):
+        db = self._session_factory()
+        try:
+            db.query(self._model).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        db = self._session_factory()
+        try:
+            stats["entries"] = db.query(self._model).count()
+        except Exception as e:
+            logger.error(f"Erro ao contar entradas do cache: {e}")
+        finally:
+            db.close()
+        return stats
+
+
+def build_result_cache(backend: Optional[str] = None) -> ResultCache:
+    """
+    Cria o cache de resultados a partir das variáveis de ambiente
+
+    RESULT_CACHE_BACKEND: memory (padrão), sqlite ou none
+    RESULT_CACHE_TTL: tempo de vida das entradas em segundos
+    RESULT_CACHE_MAX_ENTRIES: número máximo de entradas
+    RESULT_CACHE_MAX_BYTES: orçamento total em bytes
+    """
+    backend = (backend or os.getenv("RESULT_CACHE_BACKEND", "memory")).lower()
+    options = {
+        "ttl_seconds": int(os.getenv("RESULT_CACHE_TTL", "86400")),
+        "max_entries": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000")),
+        "max_bytes": int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    }
+    if backend == "memory":
+        return MemoryResultCache(**options)
+    if backend in ("sqlite", "database"):
+        try:
+            return DatabaseResultCache(**options)
+        except Exception as e:
+            logger.error(f"Erro ao criar cache em banco, usando memória: {e}")
+            return MemoryResultCache(**options)
+    return ResultCache(**options)
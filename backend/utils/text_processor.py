@@ -1,6 +1,7 @@
 import re
+import os
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional
 import PyPDF2
 import io
 
@@ -13,8 +14,13 @@ class TextProcessor:
     Processador de texto para limpeza e preparação de emails
     """
     
-    def __init__(self):
+    def __init__(self, max_chars: Optional[int] = None, max_pages: Optional[int] = None):
         self.stop_words = self._load_stop_words()
+        self._compile_patterns()
+        # Orçamento de extração de arquivos: o classificador só usa o início do texto,
+        # então paramos de ler o PDF assim que houver texto bruto suficiente
+        self.max_chars = max_chars if max_chars is not None else int(os.getenv("FILE_MAX_CHARS", "20000"))
+        self.max_pages = max_pages if max_pages is not None else int(os.getenv("PDF_MAX_PAGES", "50"))
     
     def _load_stop_words(self) -> set:
         """Carrega lista de stop words em português"""
@@ -47,10 +53,33 @@ class TextProcessor:
             'você', 'vocês', 'vos', 'à', 'às', 'éramos', 'é', 'são'
         }
     
+    def _compile_patterns(self):
+        """Pré-compila o padrão fundido e a tabela de tradução usados em process()"""
+        # Ruído (URLs, emails e telefones) é testado antes das alternativas de palavra,
+        # então é consumido por inteiro e descartado antes de virar token.
+        # Só palavras com 3+ caracteres são capturadas; as curtas são consumidas sem grupo.
+        # URL e email só começam no início de um token (lookbehind): sem isso o
+        # padrão é retentado a partir de cada posição de longas sequências de
+        # pontuação ("....", "a.a.a.") e a varredura fica quadrática
+        url_pattern = r'(?<!\w)https?://\S+'
+        email_pattern = r'(?<![\w.%+-])[\w.%+-]+@[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}'
+        phone_pattern = r'\(?\d{2}\)?\s?\d{4,5}-?\d{4}'
+        self._token_pattern = re.compile(
+            rf'{url_pattern}|{email_pattern}|{phone_pattern}|(\w{{3,}})|\w+'
+        )
+        # Stop words com até 2 caracteres já são descartadas pelo padrão
+        self._long_stop_words = frozenset(w for w in self.stop_words if len(w) > 2)
+        # Remove caracteres invisíveis comuns em textos colados (soft hyphen,
+        # zero-width e BOM), que de outra forma quebrariam palavras ao meio
+        self._translate_table = str.maketrans('', '', '\u00ad\u200b\u200c\u200d\u2060\ufeff')
+
     def process(self, text: str) -> str:
         """
         Processa e limpa o texto do email
-        
+
+        Faz minúsculas, remoção de URLs/emails/telefones, pontuação, números
+        isolados e stop words em uma única varredura com o padrão pré-compilado.
+
         Args:
             text (str): Texto original do email
             
@@ -61,62 +90,42 @@ class TextProcessor:
             if not text:
                 return ""
             
-            # Converter para minúsculas
-            text = text.lower()
-            
-            # Remover quebras de linha excessivas
-            text = re.sub(r'\n+', ' ', text)
-            
-            # Remover espaços em branco excessivos
-            text = re.sub(r'\s+', ' ', text)
-            
-            # Remover caracteres especiais, mas manter acentos
-            text = re.sub(r'[^\w\sáàâãéèêíìîóòôõúùûç]', ' ', text)
-            
-            # Remover números isolados (mas manter números em contexto)
-            text = re.sub(r'\b\d+\b', '', text)
-            
-            # Remover URLs
-            text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-            
-            # Remover emails
-            text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '', text)
-            
-            # Remover telefones
-            text = re.sub(r'\(?\d{2}\)?\s?\d{4,5}-?\d{4}', '', text)
+            text = text.translate(self._translate_table).lower()
             
-            # Remover stop words
-            words = text.split()
-            words = [word for word in words if word not in self.stop_words and len(word) > 2]
-            
-            # Reconstruir texto
-            processed_text = ' '.join(words)
-            
-            # Limpar espaços finais
-            processed_text = processed_text.strip()
+            # Apenas palavras longas são capturadas; ruído e palavras curtas retornam ''
+            stop_words = self._long_stop_words
+            words = [
+                word for word in self._token_pattern.findall(text)
+                if word and word not in stop_words and not word.isdigit()
+            ]
             
-            return processed_text
+            return ' '.join(words)
             
         except Exception as e:
             logger.error(f"Erro ao processar texto: {e}")
             return text  # Retorna texto original em caso de erro
     
-    def process_file(self, content: bytes, filename: str) -> str:
+    def process_file(self, content: bytes, filename: str,
+                     max_chars: Optional[int] = None, max_pages: Optional[int] = None) -> str:
         """
         Processa arquivo (PDF ou TXT) e extrai texto
         
         Args:
             content (bytes): Conteúdo do arquivo
             filename (str): Nome do arquivo
+            max_chars (int, opcional): Limite de caracteres brutos extraídos (padrão: self.max_chars)
+            max_pages (int, opcional): Limite de páginas lidas do PDF (padrão: self.max_pages)
             
         Returns:
             str: Texto extraído e processado
         """
         try:
+            max_chars = self.max_chars if max_chars is None else max_chars
+            max_pages = self.max_pages if max_pages is None else max_pages
             if filename.lower().endswith('.pdf'):
-                return self._extract_pdf_text(content)
+                return self._extract_pdf_text(content, max_chars, max_pages)
             elif filename.lower().endswith('.txt'):
-                return self._extract_txt_text(content)
+                return self._extract_txt_text(content, max_chars)
             else:
                 raise ValueError(f"Tipo de arquivo não suportado: {filename}")
                 
@@ -124,15 +133,40 @@ class TextProcessor:
             logger.error(f"Erro ao processar arquivo {filename}: {e}")
             raise
     
-    def _extract_pdf_text(self, content: bytes) -> str:
-        """Extrai texto de arquivo PDF"""
-        try:
-            pdf_file = io.BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+    def iter_pdf_pages(self, content: bytes, max_pages: Optional[int] = None) -> Iterator[str]:
+        """
+        Gera o texto das páginas do PDF sob demanda
+        
+        Args:
+            content (bytes): Conteúdo do arquivo PDF
+            max_pages (int, opcional): Número máximo de páginas a ler (0 ou None = todas)
             
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + " "
+        Yields:
+            str: Texto extraído de cada página
+        """
+        # BytesIO sobre bytes imutáveis não copia o buffer; o PdfReader só
+        # decodifica o conteúdo de uma página quando ela é acessada
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+        for index, page in enumerate(pdf_reader.pages):
+            if max_pages and index >= max_pages:
+                break
+            yield page.extract_text() or ""
+    
+    def _extract_pdf_text(self, content: bytes, max_chars: Optional[int] = None,
+                          max_pages: Optional[int] = None) -> str:
+        """Extrai texto de arquivo PDF, parando ao atingir o orçamento de caracteres/páginas"""
+        try:
+            chunks = []
+            total_chars = 0
+            for page_text in self.iter_pdf_pages(content, max_pages):
+                chunks.append(page_text)
+                total_chars += len(page_text) + 1
+                if max_chars and total_chars >= max_chars:
+                    break
+            
+            text = " ".join(chunks)
+            if max_chars:
+                text = text[:max_chars]
             
             return self.process(text)
             
@@ -140,7 +174,7 @@ class TextProcessor:
             logger.error(f"Erro ao extrair texto do PDF: {e}")
             raise
     
-    def _extract_txt_text(self, content: bytes) -> str:
+    def _extract_txt_text(self, content: bytes, max_chars: Optional[int] = None) -> str:
         """Extrai texto de arquivo TXT"""
         try:
             # Tentar diferentes encodings
@@ -149,13 +183,13 @@ class TextProcessor:
             for encoding in encodings:
                 try:
                     text = content.decode(encoding)
-                    return self.process(text)
+                    return self.process(text[:max_chars] if max_chars else text)
                 except UnicodeDecodeError:
                     continue
             
             # Se nenhum encoding funcionar, usar utf-8 com errors='ignore'
             text = content.decode('utf-8', errors='ignore')
-            return self.process(text)
+            return self.process(text[:max_chars] if max_chars else text)
             
         except Exception as e:
             logger.error(f"Erro ao extrair texto do TXT: {e}")